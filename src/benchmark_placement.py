@@ -0,0 +1,67 @@
+"""Compares the placement modes of the organisms
+Every organism of the input file is evaluated on the positive dataset with
+beam and anchor placement, reporting time and fitness of both modes
+"""
+
+import time
+from search_organisms import read_fasta_file, read_json_file
+from objects.organism_factory import OrganismFactory
+
+CONFIG_FILE = "config.json"
+PLACEMENT_MODES = ["beam", "anchor"]
+
+
+def main():
+    """Main execution for the placement benchmark
+
+    """
+
+    config = read_json_file(CONFIG_FILE)
+    positive_path = (
+        config["main"]["DATASET_BASE_PATH_DIR"]
+        + config["main"]["POSITIVE_FILENAME"]
+    )
+    max_sequences_to_fit_pos = config["main"]["MAX_SEQUENCES_TO_FIT_POS"]
+    input_organisms_path = config["main"]["INPUT_FILENAME"]
+
+    positive_dataset = read_fasta_file(positive_path)[
+        :max_sequences_to_fit_pos
+    ]
+
+    d_fitness = {}
+    for placement_mode in PLACEMENT_MODES:
+        config["organism"]["PLACEMENT_MODE"] = placement_mode
+        organism_factory = OrganismFactory(
+            config["organism"],
+            config["organismFactory"],
+            config["connector"],
+            config["pssm"],
+        )
+        a_organisms = organism_factory.import_organisms(input_organisms_path)
+
+        initial = time.time()
+        d_fitness[placement_mode] = [
+            org.get_seq_set_fitness_batch(positive_dataset)
+            for org in a_organisms
+        ]
+        elapsed = time.time() - initial
+
+        print(
+            "{}: {} organisms {:.2f}s mean fitness {:.2f}".format(
+                placement_mode,
+                len(a_organisms),
+                elapsed,
+                sum(d_fitness[placement_mode]) / len(a_organisms),
+            )
+        )
+
+    improved = 0
+    for beam_fitness, anchor_fitness in zip(*d_fitness.values()):
+        if anchor_fitness > beam_fitness:
+            improved += 1
+    print("anchor placement improved {} organisms".format(improved))
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,156 @@
+"""Launches several runs of the motif search at once
+Every run is a replicate of the configuration file, optionally with some of
+its values replaced, and runs on a pool of processes with its own seed and
+results directory. Datasets are read once and shared by all the runs. A
+summary with the best effective fitness and the wall time of every run is
+written at the end.
+"""
+
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import search_organisms
+from search_organisms import read_config, read_fasta_file, print_ln
+from objects.encoded_dataset import SharedDataset
+
+# Shared datasets of all the runs by path. They are read once, before the
+# pool is forked, and every run maps them instead of parsing the files again
+DATASETS: dict = {}
+
+
+def get_run_tasks(config_launcher: dict) -> list:
+    """Builds the runs of the launch. Every set of overrides is run
+    REPLICATES times
+
+    Args:
+        config_launcher: launcher section of the configuration
+
+    Returns:
+        list of dictionaries with the keys:
+            "run": number of the run
+            "seed": seed of the random stream of the run
+            "overrides": values that replace the configuration file
+    """
+    a_overrides = config_launcher["OVERRIDES"] or [{}]
+    tasks = []
+    for overrides in a_overrides:
+        for _ in range(config_launcher["REPLICATES"]):
+            tasks.append(
+                {
+                    "run": len(tasks),
+                    "seed": config_launcher["SEED"] + len(tasks),
+                    "overrides": overrides,
+                }
+            )
+    return tasks
+
+
+def get_dataset_paths(config: dict) -> list:
+    """Paths of the positive and negative datasets of a configuration
+
+    Args:
+        config: configuration of a run
+
+    Returns:
+        list with the positive and the negative path
+    """
+    return [
+        config["main"]["DATASET_BASE_PATH_DIR"]
+        + config["main"]["POSITIVE_FILENAME"],
+        config["main"]["DATASET_BASE_PATH_DIR"]
+        + config["main"]["NEGATIVE_FILENAME"],
+    ]
+
+
+def run_replicate(task: dict) -> dict:
+    """Runs the motif search with the seed and overrides of a task. The
+    output of the run is written to its results directory only
+
+    Args:
+        task: run built by get_run_tasks
+
+    Returns:
+        dictionary with the keys:
+            "run": number of the run
+            "result_dir": results directory of the run
+            "best_fitness": effective fitness of the best organism
+            "wall_time": seconds taken by the run
+    """
+    initial = time.time()
+    random.seed(task["seed"])
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(
+            devnull
+    ):
+        search_organisms.set_up(
+            task["overrides"], "_run{}".format(task["run"])
+        )
+        positive_path, negative_path = get_dataset_paths(
+            read_config(task["overrides"])
+        )
+        # Runs shuffle their datasets, so every run gets its own list of
+        # views of the shared sequences
+        best_fitness = search_organisms.main(
+            DATASETS[positive_path].get_dataset(),
+            DATASETS[negative_path].get_dataset(),
+        )
+
+    return {
+        "run": task["run"],
+        "result_dir": search_organisms.RESULT_BASE_PATH_DIR,
+        "best_fitness": best_fitness,
+        "wall_time": time.time() - initial,
+    }
+
+
+def main():
+    """Main execution for the launcher
+
+    """
+
+    config = read_config()
+    tasks = get_run_tasks(config["launcher"])
+
+    for task in tasks:
+        for path in get_dataset_paths(read_config(task["overrides"])):
+            if path not in DATASETS:
+                DATASETS[path] = SharedDataset(read_fasta_file(path))
+
+    num_workers = config["launcher"]["WORKERS"]
+    if num_workers <= 0:
+        num_workers = os.cpu_count()
+    # Runs are forked, so they inherit the shared datasets
+    try:
+        with ProcessPoolExecutor(
+                max_workers=min(num_workers, len(tasks)),
+                mp_context=multiprocessing.get_context("fork"),
+        ) as pool:
+            a_results = list(pool.map(run_replicate, tasks))
+    finally:
+        for shared in DATASETS.values():
+            shared.unlink()
+
+    summary_path = "{}launch{}.txt".format(
+        config["main"]["RESULT_BASE_PATH_DIR"], time.strftime("%Y%m%d%H%M%S")
+    )
+    print_ln("Run\tSeed\tBF\tTime\tDirectory\tOverrides", summary_path)
+    for task, result in zip(tasks, a_results):
+        print_ln(
+            "{}\t{}\t{:.2f}\t{:.2f}s\t{}\t{}".format(
+                result["run"],
+                task["seed"],
+                result["best_fitness"],
+                result["wall_time"],
+                result["result_dir"],
+                json.dumps(task["overrides"]),
+            ),
+            summary_path,
+        )
+
+
+if __name__ == "__main__":
+
+    main()
@@ -5,10 +5,24 @@ Connects two nodes at a specific distance
 
 # pylint: disable=E0402
 # type: ignore
+import copy
 import random
-from .node_object import Node
+import hashlib
+from .node_object import Node, SUBTREE_HASH_SIZE
+from .encoded_dataset import EncodedSequence
+from .placement_set import PlacementSet, get_best_indices, get_row_pairs
+from .energy_table import EnergyTable, get_energy_table
 import numpy as np
 
+# Grids of candidate pairs up to this size are scored whole. Larger ones use
+# the lazy k-best search
+LAZY_PAIRING_MIN_PAIRS = 1024
+# Relative slack of the energy bounds of the lazy k-best search
+BOUND_TOLERANCE = 1e-9
+# Pairs of candidates scored at once by the anchor placement, which bounds
+# the size of the energy and occupancy arrays of a connector
+PLACEMENT_TABLE_CHUNK_PAIRS = 1 << 16
+
 
 # pylint: disable=R0902
 class ConnectorObject(Node):
@@ -21,8 +35,8 @@ class ConnectorObject(Node):
             _mu: int,
             _sigma: int,
             config: dict,
-            node_1: Node = Node(),
-            node_2: Node = Node(),
+            node_1: Node = None,
+            node_2: Node = None,
     ):
         """Connector constructor gets mu, sigma and can get the two initial nodes.
 
@@ -30,8 +44,10 @@ class ConnectorObject(Node):
             _mu: Mean distance between node1 and node2
             _sigma: Variance between node 1 and node2
             config: Configurations loadad from config.json
-            node_1: Conceptual left node
-            node_2: Conceptual right node
+            node_1: Conceptual left node. A new placeholder Node if not
+                    given
+            node_2: Conceptual right node. A new placeholder Node if not
+                    given
 
         """
         super().__init__()
@@ -45,9 +61,17 @@ class ConnectorObject(Node):
         self.mutate_variance_sigma = config["MUTATE_VARIANCE_SIGMA"]
         self.mutate_variance_mu = config["MUTATE_VARIANCE_MU"]
         self.placement_options = config["PLACEMENT_OPTIONS"]
-
-        self.node1 = node_1
-        self.node2 = node_2
+        self.placement_resolution = config["PLACEMENT_RESOLUTION"]
+        self.pairing_window_sigmas = config["PAIRING_WINDOW_SIGMAS"]
+        self.pairing_window_exact = config["PAIRING_WINDOW_EXACT"]
+        # Shared energy table of the current mu and sigma, fetched on demand
+        self.energy_table = None
+
+        self.node1 = Node() if node_1 is None else node_1
+        self.node2 = Node() if node_2 is None else node_2
+        # Sets the parent of both children and the subtree size
+        self.set_node1(self.node1)
+        self.set_node2(self.node2)
 
     # pylint: enable=R0913
     # Setters
@@ -58,6 +82,7 @@ class ConnectorObject(Node):
             _mu: Mean distance between node1 and node2
         """
         self._mu = _mu
+        self.energy_table = None
 
     def set_sigma(self, sigma: int) -> None:
         """Set sigma variable
@@ -66,6 +91,7 @@ class ConnectorObject(Node):
             sigma: Variance between node 1 and node2
         """
         self._sigma = sigma
+        self.energy_table = None
 
     def set_node1(self, node1: Node) -> None:
         """Set left node
@@ -74,6 +100,8 @@ class ConnectorObject(Node):
             node1: Conceptual left node
         """
         self.node1 = node1
+        node1.parent = self
+        self.update_subtree_sizes()
 
     def set_node2(self, node2: Node) -> None:
         """Set right node
@@ -82,6 +110,39 @@ class ConnectorObject(Node):
             node2: Conceptual right node
         """
         self.node2 = node2
+        node2.parent = self
+        self.update_subtree_sizes()
+
+    def update_subtree_sizes(self) -> None:
+        """Recomputes the cached subtree size of the connector and of all
+        its ancestors, after one of its children changed
+        """
+        node = self
+        while node is not None:
+            node.subtree_size = (
+                node.node1.subtree_size + node.node2.subtree_size + 1
+            )
+            node = node.parent
+
+    def update_subtree_hash(self) -> None:
+        """Hashes the connector parameters and the hashes of both children,
+        which must be up to date
+        """
+        settings = (
+            self._mu,
+            self._sigma,
+            self.tau,
+            self.placement_options,
+            self.placement_resolution,
+            self.pairing_window_sigmas,
+            self.pairing_window_exact,
+        )
+        self.subtree_hash = hashlib.blake2b(
+            repr(settings).encode()
+            + self.node1.subtree_hash
+            + self.node2.subtree_hash,
+            digest_size=SUBTREE_HASH_SIZE,
+        ).digest()
 
     def count_nodes(self) -> int:
         """Counts the number of nodes below the node (including itself)
@@ -89,7 +150,7 @@ class ConnectorObject(Node):
         Returns:
             Number of nodes below the current connector
         """
-        return self.node1.count_nodes() + self.node2.count_nodes() + 1
+        return self.subtree_size
 
     def get_node(self, objective: int, node_count: int) -> Node:
         """Get a specific node based on a count and the objective node
@@ -117,44 +178,13 @@ class ConnectorObject(Node):
 
         return returned_node
 
-    def get_parent(self, _id: int) -> dict:
-        """Get the parent node of a given ID and if it is the left child
-
-        Args:
-            _id: Identificator of the child node
-
-        Returns:
-            dictionary with the parent info if exists:
-            "isRootNode": True if the _id if from the root node and has.
-                          no parent
-            "self":       Node object with the parent of the _id child.
-            "isLeftSide": True if _id child is on the left side.
-                          False otherwise.
-
-            if the parent does not exist, returns None
-        """
-
-        if self.node1._id == _id:
-            # Return itself and specify child is on left side
-            return {"is_root_node": False, "self": self, "is_left_side": True}
-
-        if self.node2._id == _id:
-            # Return itself and specify child is on right side
-            return {"is_root_node": False, "self": self, "is_left_side": False}
-
-        check_node = None
-        check_node = self.node1.get_parent(_id)
-        if check_node is None:
-            check_node = self.node2.get_parent(_id)
-        return check_node
-
     def get_all_pssm(self) -> list:
         """returns an array of all pssm objects of the organism
 
         Returns:
             List with all the pssm
         """
-        return self.node1.getAllPssm() + self.node2.getAllPssm()
+        return self.node1.get_all_pssm() + self.node2.get_all_pssm()
 
     # pylint: disable=R1702
     # pylint: disable=R0915
@@ -374,74 +404,469 @@ class ConnectorObject(Node):
     # pylint: enable=R1702
     # pylint: enable=R0915
     def get_placement_2(
-        self, s_dna: str, s_dna_len: int
-    ) -> list:
+        self, s_dna: EncodedSequence, batch_scores: dict = None
+    ) -> PlacementSet:
         """Compute the best option to connect its nodes.
 
         Args:
-            s_dna: DNA sequence
-            s_dna_length: length of the DNA sequence
+            s_dna: encoded DNA sequence
+            batch_scores: optional window scores of s_dna by pssm object
 
         Returns:
-            list of the best placed nodes with this connector
+            best placed nodes with this connector
         """
 
+        placements_1 = self.node1.get_placement_2(s_dna, batch_scores)
+        placements_2 = self.node2.get_placement_2(s_dna, batch_scores)
 
-        possible_candidates = []
+        return self.combine_placements(placements_1, placements_2)
 
-        possibilities_node_1 = self.node1.get_placement_2(s_dna, s_dna_len)
-        possibilities_node_2 = self.node2.get_placement_2(s_dna, s_dna_len)
+    def combine_placements(
+        self, placements_1: PlacementSet, placements_2: PlacementSet
+    ) -> PlacementSet:
+        """Pairs the candidates of node 1 with the candidates of node 2 and
+        keeps the best pairs. Small grids of pairs are scored at once, large
+        ones only where the energy bound can reach the best pairs.
 
-        logterm = np.log10(10 + self._sigma ** 2)
+        Args:
+            placements_1: candidates of node 1
+            placements_2: candidates of node 2
+
+        Returns:
+            best (placement_options configured) non overlapping pairs,
+            sorted by energy
+        """
+
+        num_pairs = len(placements_1) * len(placements_2)
+        index_1, index_2 = None, None
+        if num_pairs > LAZY_PAIRING_MIN_PAIRS:
+            if self.pairing_window_sigmas > 0:
+                index_1, index_2 = self.get_window_pairs(
+                    placements_1, placements_2
+                )
+            else:
+                index_1, index_2 = self.get_candidate_pairs(
+                    placements_1, placements_2
+                )
+
+        if index_1 is not None and len(index_1) < num_pairs:
+            energy, is_overlapping = self.get_pair_energies(
+                placements_1, placements_2, index_1, index_2
+            )
+        else:
+            energy, is_overlapping = self.get_grid_energies(
+                placements_1, placements_2
+            )
+            index_1, index_2 = np.divmod(
+                np.arange(energy.size), len(placements_2)
+            )
+            energy = energy.ravel()
+            is_overlapping = is_overlapping.ravel()
+
+        # Valid pairs in row-major order, ties keep that order
+        valid_pairs = np.flatnonzero(~is_overlapping)
+        best_pairs = valid_pairs[
+            get_best_indices(energy[valid_pairs], self.placement_options)
+        ]
+
+        return placements_1.pair_with(
+            placements_2,
+            index_1[best_pairs],
+            index_2[best_pairs],
+            energy[best_pairs],
+        )
+
+    def get_grid_energies(
+        self, placements_1: PlacementSet, placements_2: PlacementSet
+    ) -> tuple:
+        """Energy of every pair of candidates of both nodes
+
+        Args:
+            placements_1: candidates of node 1
+            placements_2: candidates of node 2
+
+        Returns:
+            (candidates 1, candidates 2) arrays with the energy of every
+            pair and True for the pairs whose candidates overlap
+        """
+
+        energy = (
+            placements_1.energy[:, np.newaxis]
+            + placements_2.energy[np.newaxis, :]
+            + self.get_connector_energies(
+                placements_1.position[:, np.newaxis],
+                placements_2.position[np.newaxis, :],
+            )
+        )
+        is_overlapping = (
+            placements_1.occupancy[:, :, np.newaxis]
+            & placements_2.occupancy[:, np.newaxis, :]
+        ).any(axis=0)
+
+        return energy, is_overlapping
+
+    def get_pair_energies(
+        self,
+        placements_1: PlacementSet,
+        placements_2: PlacementSet,
+        index_1: np.ndarray,
+        index_2: np.ndarray,
+    ) -> tuple:
+        """Energy of a set of pairs of candidates
+
+        Args:
+            placements_1: candidates of node 1
+            placements_2: candidates of node 2
+            index_1: candidate of node 1 of every pair
+            index_2: candidate of node 2 of every pair
+
+        Returns:
+            energy of every pair and True for the pairs whose candidates
+            overlap
+        """
+
+        energy = (
+            placements_1.energy[index_1]
+            + placements_2.energy[index_2]
+            + self.get_connector_energies(
+                placements_1.position[index_1], placements_2.position[index_2]
+            )
+        )
+        is_overlapping = (
+            placements_1.occupancy[:, index_1]
+            & placements_2.occupancy[:, index_2]
+        ).any(axis=0)
+
+        return energy, is_overlapping
+
+    def get_candidate_pairs(
+        self, placements_1: PlacementSet, placements_2: PlacementSet
+    ) -> tuple:
+        """Lazy k-best search. Both sets are sorted by energy, so the energy
+        of a pair is bounded by the energies of its candidates plus the
+        highest connector energy. Pairs with the best bounds are scored
+        first, and only the pairs whose bound reaches the k-th best energy
+        found are returned.
+
+        Args:
+            placements_1: candidates of node 1, sorted by energy
+            placements_2: candidates of node 2, sorted by energy
 
-        for possibility_1 in possibilities_node_1:
-            for possibility_2 in possibilities_node_2:
-
-                # Check that is not overlapping
-                is_overlapping = False
-                for pssm_1 in possibility_1["lock_vector"]:
-                    # if is_overlapping:
-                    #     continue
-                    for pssm_2 in possibility_2["lock_vector"]:
-                        # if is_overlapping:
-                        #     continue
-
-                        # It can be done in one sentence but in multiple lines
-                        # it looks more understandable.
-                        if (pssm_2["position"] < pssm_1["position"] + pssm_1["length"]
-                                and pssm_2["position"] >= pssm_1["position"]):
-                            is_overlapping = True
-
-                        if (pssm_1["position"] < pssm_2["position"] + pssm_2["length"]
-                                and pssm_1["position"] >= pssm_2["position"]):
-                            is_overlapping = True
-
-                if is_overlapping:
-                    continue
-
-                numerator = (
-                    self._mu
-                    - (
-                        possibility_2["position"] -
-                        possibility_1["position"]
-                    )
-                ) ** 2
-                exponent = -1.0 * numerator / (1 + 2 * (self._sigma ** 2))
-                expterm = np.exp(exponent)
-                # compute additive connector energy term
-                e_connector = (self.tau / logterm) * expterm
-
-                energy = possibility_1["energy"] + possibility_2["energy"] + e_connector
-
-                possible_candidates.append({
-                    "position": (possibility_1["position"] + possibility_2["position"]) / 2,
-                    "energy": energy,
-                    "lock_vector": possibility_1["lock_vector"] + possibility_2["lock_vector"]
-                    })
-
-        possible_candidates.sort(key=lambda c: c["energy"], reverse=True)
-
-        return possible_candidates[:self.placement_options]
+        Returns:
+            index in node 1 and index in node 2 of every pair that can be
+            among the best (placement_options configured) pairs, in
+            row-major order
+        """
+
+        threshold = self.get_staircase_threshold(placements_1, placements_2)
+        if threshold is None:
+            return np.divmod(
+                np.arange(len(placements_1) * len(placements_2)),
+                len(placements_2),
+            )
+
+        return self.get_bound_pairs(
+            placements_1,
+            placements_2,
+            threshold,
+            self.get_energy_table().get_max_energy(),
+        )
+
+    def get_window_pairs(
+        self, placements_1: PlacementSet, placements_2: PlacementSet
+    ) -> tuple:
+        """Distance-window pruning of the lazy k-best search. Far from mu
+        the connector energy is almost zero, so out of the window mu +/- c
+        standard deviations a pair can only win on the energy of its
+        candidates. In the exact setting, pairs out of the window are kept
+        if their bound, with the highest connector energy out of the window,
+        reaches the k-th best energy, so no pair of the best ones is missed.
+        Otherwise only the best pair out of the window of every candidate of
+        node 1 is kept.
+
+        Args:
+            placements_1: candidates of node 1, sorted by energy
+            placements_2: candidates of node 2, sorted by energy
+
+        Returns:
+            index in node 1 and index in node 2 of every pair to score, in
+            row-major order
+        """
+
+        threshold = self.get_staircase_threshold(placements_1, placements_2)
+        if threshold is None:
+            return self.get_candidate_pairs(placements_1, placements_2)
+
+        index_1, index_2 = self.get_bound_pairs(
+            placements_1,
+            placements_2,
+            threshold,
+            self.get_energy_table().get_max_energy(),
+        )
+
+        # The Gaussian term has a variance of sigma^2 + 1/2
+        offset = self.pairing_window_sigmas * np.sqrt(
+            self._sigma ** 2 + 0.5
+        )
+        is_in_window = np.abs(
+            placements_2.position[index_2]
+            - placements_1.position[index_1]
+            - self._mu
+        ) <= offset
+
+        if self.pairing_window_exact:
+            far_connector_energy = self.get_energy_table().get_max_energy(
+                offset
+            )
+            energy_1 = placements_1.energy[index_1]
+            energy_2 = placements_2.energy[index_2]
+            is_kept = is_in_window | (
+                energy_1 + energy_2
+                >= threshold - far_connector_energy - BOUND_TOLERANCE * (
+                    np.abs(threshold)
+                    + np.abs(far_connector_energy)
+                    + np.abs(energy_1)
+                    + np.abs(energy_2)
+                )
+            )
+        else:
+            # Pairs are in row-major order, so the first far pair of a row
+            # has the best candidate of node 2
+            far_pairs = np.flatnonzero(~is_in_window)
+            _, first_far = np.unique(index_1[far_pairs], return_index=True)
+            is_kept = is_in_window
+            is_kept[far_pairs[first_far]] = True
+
+        return index_1[is_kept], index_2[is_kept]
+
+    def get_staircase_threshold(
+        self, placements_1: PlacementSet, placements_2: PlacementSet
+    ) -> float:
+        """Scores the pairs with the best bounds until k of them are valid.
+        Pair (i, j) is beaten by the (i + 1) * (j + 1) - 1 pairs above and
+        to its left, so the pairs with the k best bounds lie under the
+        staircase (i + 1) * (j + 1) <= k, which doubles until k pairs are
+        valid.
+
+        Args:
+            placements_1: candidates of node 1, sorted by energy
+            placements_2: candidates of node 2, sorted by energy
+
+        Returns:
+            k-th (placement_options configured) best energy found. None if
+            the whole grid has less valid pairs
+        """
+        num_pairs = len(placements_1) * len(placements_2)
+        staircase = self.placement_options
+        while True:
+            rows = np.arange(min(len(placements_1), staircase))
+            index_1, index_2 = get_row_pairs(
+                np.minimum(staircase // (rows + 1), len(placements_2))
+            )
+            threshold = self.get_threshold(
+                placements_1, placements_2, index_1, index_2
+            )
+            if threshold is not None or len(index_1) == num_pairs:
+                return threshold
+            staircase *= 2
+
+    def get_threshold(
+        self,
+        placements_1: PlacementSet,
+        placements_2: PlacementSet,
+        index_1: np.ndarray,
+        index_2: np.ndarray,
+    ) -> float:
+        """Scores a set of pairs and returns the k-th best energy of the
+        valid ones. The best pairs of the grid score at least that
+
+        Args:
+            placements_1: candidates of node 1
+            placements_2: candidates of node 2
+            index_1: candidate of node 1 of every pair
+            index_2: candidate of node 2 of every pair
+
+        Returns:
+            k-th (placement_options configured) best energy. None if there
+            are less valid pairs
+        """
+        energy, is_overlapping = self.get_pair_energies(
+            placements_1, placements_2, index_1, index_2
+        )
+        valid_energy = energy[~is_overlapping]
+        if len(valid_energy) < self.placement_options:
+            return None
+        return -np.partition(
+            -valid_energy, self.placement_options - 1
+        )[self.placement_options - 1]
+
+    def get_bound_pairs(
+        self,
+        placements_1: PlacementSet,
+        placements_2: PlacementSet,
+        threshold: float,
+        max_connector_energy: float,
+    ) -> tuple:
+        """Every pair whose energy bound reaches a threshold. The bound of a
+        pair is the energy of its candidates plus the highest connector
+        energy. The limits are widened by a small tolerance to absorb
+        rounding
+
+        Args:
+            placements_1: candidates of node 1, sorted by energy
+            placements_2: candidates of node 2, sorted by energy
+            threshold: lowest energy of interest
+            max_connector_energy: upper bound of the connector energy
+
+        Returns:
+            index in node 1 and index in node 2 of every pair, in
+            row-major order
+        """
+        limits = threshold - max_connector_energy - placements_1.energy
+        limits -= BOUND_TOLERANCE * (
+            np.abs(threshold)
+            + np.abs(max_connector_energy)
+            + np.abs(placements_1.energy)
+            + np.abs(placements_2.energy[0])
+        )
+        return get_row_pairs(
+            np.searchsorted(-placements_2.energy, -limits, side="right")
+        )
+
+    def get_placement_table(
+        self, s_dna: EncodedSequence, batch_scores: dict = None
+    ) -> PlacementSet:
+        """Anchor placement. Computes the best placement of the subtree
+        anchored at every position of the sequence, instead of keeping only
+        the best few placements.
+
+        Args:
+            s_dna: encoded DNA sequence
+            batch_scores: optional window scores of s_dna by pssm object
+
+        Returns:
+            best non overlapping placement of every anchor bin, sorted by
+            position
+        """
+
+        table_1 = self.node1.get_placement_table(s_dna, batch_scores)
+        table_2 = self.node2.get_placement_table(s_dna, batch_scores)
+
+        return self.combine_placement_tables(table_1, table_2)
+
+    def combine_placement_tables(
+        self, table_1: PlacementSet, table_2: PlacementSet
+    ) -> PlacementSet:
+        """Max-convolution of the placement tables of both nodes. Every pair
+        of anchors is scored with the connector energy, and for every anchor
+        bin of the connector only the best non overlapping pair is kept.
+        Ties keep the first pair in row-major order. Pairs are scored a few
+        rows of node 1 at a time, so memory does not grow with the grid.
+        This is an approximation: pairs dropped from a bin may be the only
+        ones that do not overlap the nodes paired above this connector
+
+        Args:
+            table_1: placement table of node 1
+            table_2: placement table of node 2
+
+        Returns:
+            best pair of every anchor bin (placement_resolution configured),
+            sorted by position
+        """
+
+        num_2 = len(table_2)
+        if len(table_1) == 0 or num_2 == 0:
+            no_pairs = np.zeros(0, dtype=np.int64)
+            return table_1.pair_with(
+                table_2, no_pairs, no_pairs, np.zeros(0)
+            )
+
+        first_bin = self.get_anchor_bins(
+            table_1.position.min(), table_2.position.min()
+        )
+        num_bins = self.get_anchor_bins(
+            table_1.position.max(), table_2.position.max()
+        ) - first_bin + 1
+        best_energy = np.full(num_bins, -np.inf)
+        best_pairs = np.zeros(num_bins, dtype=np.int64)
+
+        rows_per_chunk = max(PLACEMENT_TABLE_CHUNK_PAIRS // num_2, 1)
+        for first_row in range(0, len(table_1), rows_per_chunk):
+            rows = table_1.get_rows(first_row, first_row + rows_per_chunk)
+            energy, is_overlapping = self.get_grid_energies(rows, table_2)
+            energy[is_overlapping] = -np.inf
+            energy = energy.ravel()
+            anchor_bins = self.get_anchor_bins(
+                rows.position[:, np.newaxis], table_2.position[np.newaxis, :]
+            ).ravel() - first_bin
+
+            chunk_energy = np.full(num_bins, -np.inf)
+            np.maximum.at(chunk_energy, anchor_bins, energy)
+            # First pair of the chunk that reaches the best energy of its
+            # bin, if it beats the pairs of the previous chunks
+            pairs = np.flatnonzero(
+                (energy == chunk_energy[anchor_bins])
+                & (energy > best_energy[anchor_bins])
+            )
+            improved_bins, first_pairs = np.unique(
+                anchor_bins[pairs], return_index=True
+            )
+            pairs = pairs[first_pairs]
+            best_energy[improved_bins] = energy[pairs]
+            best_pairs[improved_bins] = first_row * num_2 + pairs
+
+        placed_bins = np.flatnonzero(best_energy > -np.inf)
+        best_1, best_2 = np.divmod(best_pairs[placed_bins], num_2)
+
+        return table_1.pair_with(
+            table_2, best_1, best_2, best_energy[placed_bins]
+        )
+
+    def get_anchor_bins(
+        self, position_1: np.ndarray, position_2: np.ndarray
+    ) -> np.ndarray:
+        """Anchor bin of pairs of positions. The anchor of a pair is the
+        middle point of the two nodes. Arrays are broadcast against each
+        other
+
+        Args:
+            position_1: positions of node 1
+            position_2: positions of node 2
+
+        Returns:
+            anchor bin of every pair (placement_resolution configured)
+        """
+        return np.floor(
+            (position_1 + position_2) / (2 * self.placement_resolution)
+        ).astype(np.int64)
+
+    def get_connector_energies(
+        self, position_1: np.ndarray, position_2: np.ndarray
+    ) -> np.ndarray:
+        """Gaussian connector energy of pairs of positions. Arrays are
+        broadcast against each other
+
+        Args:
+            position_1: positions of node 1
+            position_2: positions of node 2
+
+        Returns:
+            array of connector energies
+        """
+        return self.get_energy_table().get_energies(position_2 - position_1)
+
+    def get_energy_table(self) -> EnergyTable:
+        """Getter of the energy table of the current mu and sigma
+
+        Returns:
+            EnergyTable shared with the connectors with the same mu, sigma
+            and tau
+        """
+        if self.energy_table is None:
+            self.energy_table = get_energy_table(
+                self._mu, self._sigma, self.tau
+            )
+        return self.energy_table
 
     def set_node(self, node, _id) -> None:
         """Sets the node on a given ID
@@ -453,9 +878,9 @@ class ConnectorObject(Node):
         """
 
         if self.node1._id == _id:
-            self.node1 = node
+            self.set_node1(node)
         elif self.node2._id == _id:
-            self.node2 = node
+            self.set_node2(node)
         else:
             self.node1.set_node(node, _id)
             self.node2.set_node(node, _id)
@@ -476,6 +901,21 @@ class ConnectorObject(Node):
         return new_id
 
     # pylint: disable=W0613
+    def clone(self):
+        """Copies the connector and all the nodes below it. Configuration
+        values and the energy table are shared with the copy
+
+        Returns:
+            ConnectorObject with the same genome and no parent
+        """
+        new_connector = copy.copy(self)
+        new_connector.parent = None
+        new_connector.node1 = self.node1.clone()
+        new_connector.node1.parent = new_connector
+        new_connector.node2 = self.node2.clone()
+        new_connector.node2.parent = new_connector
+        return new_connector
+
     def mutate(self, org_factory) -> None:
         """mutation for a connector
 
@@ -488,12 +928,14 @@ class ConnectorObject(Node):
             self._sigma += random.randint(
                 -self.mutate_variance_sigma, self.mutate_variance_sigma
             )
+            self.energy_table = None
 
         if random.random() < self.mutate_probability_mu:
             # Alter mu
             self._mu += random.randint(
                 -self.mutate_variance_mu, self.mutate_variance_mu
             )
+            self.energy_table = None
 
         if random.random() < self.mutate_probability_swap:
             # Swap connectors
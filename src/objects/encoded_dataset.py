@@ -0,0 +1,448 @@
+"""Encoded dataset object
+Holds DNA sequences already pre-processed for the scan engine, so no string
+work is needed while organisms are evaluated
+"""
+
+import itertools
+import numpy as np
+
+# Integer code assigned to every base. Complementary bases add up to 3, so
+# the complement of a code is 3 - code
+BASE_CODES = {"a": 0, "c": 1, "g": 2, "t": 3}
+COMPLEMENT_CODE = 3
+# Lookup table from ASCII character to base code
+INVALID_CODE = 255
+ASCII_TO_CODE = np.full(256, INVALID_CODE, dtype=np.uint8)
+for _base, _code in BASE_CODES.items():
+    ASCII_TO_CODE[ord(_base)] = _code
+    ASCII_TO_CODE[ord(_base.upper())] = _code
+# Lookup table from base code to ASCII character
+CODE_TO_ASCII = np.zeros(len(BASE_CODES), dtype=np.uint8)
+for _base, _code in BASE_CODES.items():
+    CODE_TO_ASCII[_code] = ord(_base)
+
+# Sequence identifiers are unique in the whole process
+SEQUENCE_IDS = itertools.count()
+# Offsets and sequence ids of a shared block are stored as int64
+SHARED_INDEX_DTYPE = np.dtype(np.int64)
+# Shared memory blocks mapped by the process, by name. Blocks stay mapped
+# while the process runs, since views of their codes may be anywhere
+SHARED_BLOCKS: dict = {}
+
+
+def encode_sequence(s_dna: str) -> np.ndarray:
+    """Encodes a DNA sequence as an array of base codes
+
+    Args:
+        s_dna: DNA sequence
+
+    Returns:
+        uint8 array with the code of every base of the sequence
+    """
+    codes = ASCII_TO_CODE[np.frombuffer(s_dna.encode("ascii"), dtype=np.uint8)]
+    if (codes == INVALID_CODE).any():
+        raise ValueError("Sequence contains bases other than a, c, g, t")
+    return codes
+
+
+def get_kmer_codes(codes: np.ndarray, kmer_length: int) -> np.ndarray:
+    """Computes the rolling k-mer codes over the last axis of an array of
+    base codes
+
+    Args:
+        codes: base codes of one sequence, or one sequence per row
+        kmer_length: number of bases of each k-mer
+
+    Returns:
+        array with one k-mer code per window, using the smallest unsigned
+        type that can hold 4^kmer_length codes
+    """
+    dtype = np.min_scalar_type(len(BASE_CODES) ** kmer_length - 1)
+    num_windows = max(codes.shape[-1] - kmer_length + 1, 0)
+    kmer_codes = np.zeros(codes.shape[:-1] + (num_windows,), dtype=dtype)
+    for column in range(kmer_length):
+        kmer_codes *= len(BASE_CODES)
+        kmer_codes += codes[..., column: column + num_windows]
+    return kmer_codes
+
+
+class EncodedSequence:
+    """Single DNA sequence encoded as base codes. Only the codes are kept,
+    the string format is decoded when needed
+    """
+
+    def __init__(self, codes: np.ndarray, seq_id: int = None) -> None:
+        """EncodedSequence constructor
+
+        Args:
+            codes: uint8 array with the code of every base. It may be a
+                   read-only view of a shared memory block
+            seq_id: identifier of the sequence. A new one is assigned if
+                    not given
+        """
+        self.seq_id = next(SEQUENCE_IDS) if seq_id is None else seq_id
+        self.codes = codes
+        self.length = len(self.codes)
+        # Sliding window views and rolling k-mer codes by window length
+        self.windows: dict = {}
+        self.kmer_codes: dict = {}
+
+    @classmethod
+    def from_string(cls, s_dna: str):
+        """Encodes a DNA sequence
+
+        Args:
+            s_dna: DNA sequence in string format
+
+        Returns:
+            EncodedSequence of the sequence
+        """
+        return cls(encode_sequence(s_dna))
+
+    @property
+    def sequence(self) -> str:
+        """DNA sequence in lower case string format
+        """
+        return CODE_TO_ASCII[self.codes].tobytes().decode("ascii")
+
+    def get_windows(self, window_length: int) -> np.ndarray:
+        """Returns a view with one row per window of the given length.
+        Views are built once per length and share memory with the codes
+
+        Args:
+            window_length: number of bases of each window
+
+        Returns:
+            (num_windows, window_length) read-only view of the codes
+        """
+        if window_length not in self.windows:
+            self.windows[
+                window_length
+            ] = np.lib.stride_tricks.sliding_window_view(
+                self.codes, window_length
+            )
+        return self.windows[window_length]
+
+    def get_kmer_codes(self, kmer_length: int) -> np.ndarray:
+        """Returns the rolling k-mer code of every window of the given length.
+        The code of a window is its bases read as a base-4 number, the first
+        base being the most significant one.
+
+        Args:
+            kmer_length: number of bases of each k-mer
+
+        Returns:
+            array with the k-mer code of the window starting at every position
+        """
+        if kmer_length not in self.kmer_codes:
+            self.kmer_codes[kmer_length] = get_kmer_codes(
+                self.codes, kmer_length
+            )
+        return self.kmer_codes[kmer_length]
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __str__(self) -> str:
+        return self.sequence
+
+
+class EncodedDataset:
+    """List of encoded sequences. It can be sliced and shuffled like a list,
+    slices share the same EncodedSequence objects
+    """
+
+    def __init__(self, sequences: list) -> None:
+        """EncodedDataset constructor
+
+        Args:
+            sequences: list of EncodedSequence objects
+        """
+        self.sequences = sequences
+        # Padded 2-D packing of the codes, built on demand
+        self.padded_codes = None
+        self.padded_kmer_codes: dict = {}
+        self.lengths = None
+        # Descriptor of the shared block of the sequences, see SharedDataset
+        self.shared_descriptor = None
+
+    @classmethod
+    def from_strings(cls, a_dna: list):
+        """Encodes a list of DNA sequences
+
+        Args:
+            a_dna: DNA sequences in string format
+
+        Returns:
+            EncodedDataset with all the sequences encoded
+        """
+        return cls([EncodedSequence.from_string(s_dna) for s_dna in a_dna])
+
+    def get_strings(self) -> list:
+        """Returns the sequences in string format
+
+        Returns:
+            list of DNA sequences
+        """
+        return [sequence.sequence for sequence in self.sequences]
+
+    def get_padded_codes(self) -> tuple:
+        """Packs all the sequences into a padded 2-D array so they can be
+        scanned in a single vectorized pass. Rows shorter than the longest
+        sequence are padded with code 0 and must be masked with the lengths.
+
+        Returns:
+            (num_sequences, max_length) uint8 array of codes and an array
+            with the length of every sequence
+        """
+        if self.padded_codes is None:
+            lengths = np.array(
+                [sequence.length for sequence in self.sequences], dtype=int
+            )
+            max_length = lengths.max() if len(self.sequences) else 0
+            padded_codes = np.zeros(
+                (len(self.sequences), max_length), dtype=np.uint8
+            )
+            for row, sequence in enumerate(self.sequences):
+                padded_codes[row, :sequence.length] = sequence.codes
+            # Published once complete, since threads may share the dataset
+            self.lengths = lengths
+            self.padded_codes = padded_codes
+        return self.padded_codes, self.lengths
+
+    def get_padded_kmer_codes(self, kmer_length: int) -> np.ndarray:
+        """Rolling k-mer codes of the padded 2-D packing of the dataset
+
+        Args:
+            kmer_length: number of bases of each k-mer
+
+        Returns:
+            (num_sequences, num_windows) array of k-mer codes. Windows that
+            reach the padding must be masked with the lengths
+        """
+        padded_codes, _ = self.get_padded_codes()
+        if kmer_length not in self.padded_kmer_codes:
+            self.padded_kmer_codes[kmer_length] = get_kmer_codes(
+                padded_codes, kmer_length
+            )
+        return self.padded_kmer_codes[kmer_length]
+
+    def sort(self) -> None:
+        """Sorts the dataset by sequence, the same way a list of strings is
+        sorted
+        """
+        self.sequences.sort(key=lambda sequence: sequence.sequence)
+        self.padded_codes = None
+        self.padded_kmer_codes = {}
+
+    def __len__(self) -> int:
+        return len(self.sequences)
+
+    def __iter__(self):
+        return iter(self.sequences)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            # Slices of a shared dataset are still sent as the descriptor
+            dataset = EncodedDataset(self.sequences[index])
+            dataset.shared_descriptor = self.shared_descriptor
+            return dataset
+        return self.sequences[index]
+
+    def __setitem__(self, index, sequence) -> None:
+        self.sequences[index] = sequence
+        self.padded_codes = None
+        self.padded_kmer_codes = {}
+
+    def __reduce__(self):
+        # Shared datasets are sent to other processes as their descriptor
+        # and the positions of their sequences in the block, so slices and
+        # shuffles keep their sequences and order
+        if self.shared_descriptor is not None:
+            block_indices = self.get_block_indices()
+            if block_indices is not None:
+                return (
+                    attach_dataset, (self.shared_descriptor, block_indices)
+                )
+        return (EncodedDataset, (self.sequences,))
+
+    def get_block_indices(self) -> list:
+        """Positions of the sequences of a shared dataset in its block
+
+        Returns:
+            list with the block index of every sequence. None if some
+            sequence is not in the block
+        """
+        _, _, seq_ids = get_shared_arrays(
+            get_shared_block(self.shared_descriptor), self.shared_descriptor
+        )
+        d_indices = {
+            seq_id: index for index, seq_id in enumerate(seq_ids.tolist())
+        }
+        block_indices = [
+            d_indices.get(sequence.seq_id) for sequence in self.sequences
+        ]
+        if None in block_indices:
+            return None
+        return block_indices
+
+
+def get_shared_layout(descriptor: dict) -> dict:
+    """Byte offsets of the arrays of a shared block. The block holds the
+    codes of all the sequences one after another, the offset table of the
+    sequences and their ids
+
+    Args:
+        descriptor: descriptor of the block, see SharedDataset
+
+    Returns:
+        dictionary with the keys:
+            "offsets": byte offset of the offset table
+            "seq_ids": byte offset of the sequence ids
+            "size": total bytes of the block
+    """
+    itemsize = SHARED_INDEX_DTYPE.itemsize
+    # Tables are aligned to their item size
+    offsets = -(-descriptor["num_bases"] // itemsize) * itemsize
+    seq_ids = offsets + (descriptor["num_sequences"] + 1) * itemsize
+    return {
+        "offsets": offsets,
+        "seq_ids": seq_ids,
+        "size": seq_ids + descriptor["num_sequences"] * itemsize,
+    }
+
+
+def get_shared_arrays(block, descriptor: dict) -> tuple:
+    """Arrays of a shared block, as views of its memory
+
+    Args:
+        block: SharedMemory object of the block
+        descriptor: descriptor of the block, see SharedDataset
+
+    Returns:
+        codes of all the sequences, offset table and sequence ids. The
+        codes of sequence i are codes[offsets[i]:offsets[i + 1]]
+    """
+    layout = get_shared_layout(descriptor)
+    codes = np.ndarray(
+        (descriptor["num_bases"],), dtype=np.uint8, buffer=block.buf
+    )
+    offsets = np.ndarray(
+        (descriptor["num_sequences"] + 1,),
+        dtype=SHARED_INDEX_DTYPE,
+        buffer=block.buf,
+        offset=layout["offsets"],
+    )
+    seq_ids = np.ndarray(
+        (descriptor["num_sequences"],),
+        dtype=SHARED_INDEX_DTYPE,
+        buffer=block.buf,
+        offset=layout["seq_ids"],
+    )
+    return codes, offsets, seq_ids
+
+
+def get_shared_block(descriptor: dict):
+    """Maps a shared block, once per process
+
+    Args:
+        descriptor: descriptor of the block, see SharedDataset
+
+    Returns:
+        SharedMemory object of the block
+    """
+    # Shared memory needs Python 3.8, so runs in a single process do not
+    # import it
+    from multiprocessing import shared_memory  # pylint: disable=C0415
+
+    block = SHARED_BLOCKS.get(descriptor["name"])
+    if block is None:
+        block = shared_memory.SharedMemory(name=descriptor["name"])
+        SHARED_BLOCKS[descriptor["name"]] = block
+    return block
+
+
+def attach_dataset(
+        descriptor: dict, block_indices: list = None
+) -> EncodedDataset:
+    """Dataset with the sequences of a shared block. Sequences are
+    read-only views of the block, so no sequence data is copied
+
+    Args:
+        descriptor: descriptor of the block, see SharedDataset
+        block_indices: positions in the block of the sequences of the
+                       dataset, in dataset order. All the sequences of the
+                       block in block order if not given
+
+    Returns:
+        EncodedDataset with the sequences of the block
+    """
+    codes, offsets, seq_ids = get_shared_arrays(
+        get_shared_block(descriptor), descriptor
+    )
+    codes.flags.writeable = False
+
+    if block_indices is None:
+        block_indices = range(descriptor["num_sequences"])
+    offsets = offsets.tolist()
+    seq_ids = seq_ids.tolist()
+    dataset = EncodedDataset(
+        [
+            EncodedSequence(
+                codes[offsets[index]:offsets[index + 1]], seq_ids[index]
+            )
+            for index in block_indices
+        ]
+    )
+    dataset.shared_descriptor = descriptor
+    return dataset
+
+
+class SharedDataset:
+    """Owner of a shared memory block with the sequences of a dataset.
+    Other processes attach the block with its descriptor
+    """
+
+    def __init__(self, dataset: EncodedDataset) -> None:
+        """SharedDataset constructor. Copies the codes of the dataset to a
+        new block
+
+        Args:
+            dataset: EncodedDataset to share
+        """
+        from multiprocessing import shared_memory  # pylint: disable=C0415
+
+        lengths = [sequence.length for sequence in dataset]
+        descriptor = {
+            "name": None,
+            "num_sequences": len(lengths),
+            "num_bases": sum(lengths),
+        }
+        # Blocks can not be empty
+        self.block = shared_memory.SharedMemory(
+            create=True, size=max(get_shared_layout(descriptor)["size"], 1)
+        )
+        descriptor["name"] = self.block.name
+        SHARED_BLOCKS[self.block.name] = self.block
+        self.descriptor = descriptor
+
+        codes, offsets, seq_ids = get_shared_arrays(self.block, descriptor)
+        offsets[0] = 0
+        np.cumsum(lengths, out=offsets[1:])
+        for index, sequence in enumerate(dataset):
+            codes[offsets[index]:offsets[index + 1]] = sequence.codes
+            seq_ids[index] = sequence.seq_id
+
+    def get_dataset(self) -> EncodedDataset:
+        """Dataset with the sequences of the block
+
+        Returns:
+            EncodedDataset with read-only views of the block
+        """
+        return attach_dataset(self.descriptor)
+
+    def unlink(self) -> None:
+        """Removes the block once the run is over. Processes that mapped it
+        keep their views until they exit
+        """
+        self.block.unlink()
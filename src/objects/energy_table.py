@@ -0,0 +1,137 @@
+"""Energy table object
+Lookup tables of the Gaussian connector energy by distance. Tables are shared
+by every connector with the same mu, sigma and tau
+"""
+
+from collections import OrderedDict
+import threading
+import numpy as np
+
+# Distances are tabulated every 1 / DISTANCE_STEPS bases. Pssm positions are
+# integers or half-integers, so the distances between them are tabulated
+DISTANCE_STEPS = 2
+# Distance covered by a new table, in bases. Tables grow when needed
+INITIAL_MAX_DISTANCE = 256
+# Number of tables kept by the process
+ENERGY_TABLES_MAX_ENTRIES = 4096
+
+
+class EnergyTable:
+    """Connector energy of every tabulated distance between two nodes
+    """
+
+    def __init__(self, _mu: int, _sigma: int, tau: float) -> None:
+        """EnergyTable constructor
+
+        Args:
+            _mu: Mean distance between node1 and node2
+            _sigma: Variance between node 1 and node2
+            tau: Modules the value of the connector energy
+        """
+        self._mu = _mu
+        self._sigma = _sigma
+        self.tau = tau
+        self.logterm = np.log10(10 + self._sigma ** 2)
+        self.max_index = 0
+        self.energies = np.zeros(0)
+        self.set_max_index(INITIAL_MAX_DISTANCE * DISTANCE_STEPS)
+
+    def set_max_index(self, max_index: int) -> None:
+        """Tabulates all the distances up to a number of steps, in both
+        directions
+
+        Args:
+            max_index: number of steps of the longest distance
+        """
+        # The table is replaced in a single assignment, so threads reading
+        # it never see a half-built one
+        self.energies = self.compute_energies(
+            np.arange(-max_index, max_index + 1) / DISTANCE_STEPS
+        )
+        self.max_index = max_index
+
+    def compute_energies(self, distances: np.ndarray) -> np.ndarray:
+        """Computes the connector energy of a set of distances
+
+        Args:
+            distances: position of node 2 minus position of node 1
+
+        Returns:
+            array of connector energies
+        """
+        numerator = (self._mu - distances) ** 2
+        exponent = -1.0 * numerator / (1 + 2 * (self._sigma ** 2))
+        expterm = np.exp(exponent)
+        # compute additive connector energy term
+        return (self.tau / self.logterm) * expterm
+
+    def get_energies(self, distances: np.ndarray) -> np.ndarray:
+        """Connector energy of a set of distances. Tabulated distances are
+        looked up, the rest are computed
+
+        Args:
+            distances: position of node 2 minus position of node 1
+
+        Returns:
+            array of connector energies
+        """
+        steps = distances * DISTANCE_STEPS
+        index = np.rint(steps)
+        if index.size > 0:
+            max_index = int(np.abs(index).max())
+            if max_index > self.max_index:
+                self.set_max_index(max(max_index, 2 * self.max_index))
+
+        table = self.energies
+        # Distance 0 is the middle of the table
+        energies = table[index.astype(np.int64) + len(table) // 2]
+        is_computed = index != steps
+        if is_computed.any():
+            energies[is_computed] = self.compute_energies(
+                distances[is_computed]
+            )
+        return energies
+
+    def get_max_energy(self, offset: float = 0.0) -> float:
+        """Highest energy of the connector when the distance between the
+        nodes is at least offset bases away from mu
+
+        Args:
+            offset: minimum difference between the distance and mu
+
+        Returns:
+            upper bound of the connector energy
+        """
+        expterm = np.exp(-1.0 * offset ** 2 / (1 + 2 * (self._sigma ** 2)))
+        return max((self.tau / self.logterm) * expterm, 0.0)
+
+
+# Tables shared by all the connectors of the process, least recently used
+# first
+ENERGY_TABLES: OrderedDict = OrderedDict()
+ENERGY_TABLES_LOCK = threading.Lock()
+
+
+def get_energy_table(_mu: int, _sigma: int, tau: float) -> EnergyTable:
+    """Returns the shared table of some connector parameters, building it
+    if needed
+
+    Args:
+        _mu: Mean distance between node1 and node2
+        _sigma: Variance between node 1 and node2
+        tau: Modules the value of the connector energy
+
+    Returns:
+        EnergyTable of the parameters
+    """
+    key = (_mu, _sigma, tau)
+    with ENERGY_TABLES_LOCK:
+        table = ENERGY_TABLES.get(key)
+        if table is None:
+            table = EnergyTable(_mu, _sigma, tau)
+            ENERGY_TABLES[key] = table
+            if len(ENERGY_TABLES) > ENERGY_TABLES_MAX_ENTRIES:
+                ENERGY_TABLES.popitem(last=False)
+        else:
+            ENERGY_TABLES.move_to_end(key)
+    return table
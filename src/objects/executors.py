@@ -0,0 +1,146 @@
+"""Executor objects
+Run a function over a list of tasks serially, on a pool of threads or on a
+pool of processes. Pool workers are started once and reused by every call,
+and results are always returned in the order of the tasks.
+"""
+
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+# Tasks sent to a process at once are about len(tasks) / (CHUNKS_PER_WORKER
+# * workers), so workers stay balanced without paying one message per task
+CHUNKS_PER_WORKER = 4
+
+
+class SerialExecutor:
+    """Runs the tasks one after another in the current process
+    """
+
+    def __init__(self, initializer, initargs: tuple) -> None:
+        """SerialExecutor constructor
+
+        Args:
+            initializer: function that sets up the resident data of a worker
+            initargs: arguments of the initializer
+        """
+        self.num_workers = 1
+        initializer(*initargs)
+
+    def map(self, function, tasks: list) -> list:
+        """Runs a function on every task
+
+        Args:
+            function: function of one argument
+            tasks: argument of every call
+
+        Returns:
+            list with the result of every task, in task order
+        """
+        return [function(task) for task in tasks]
+
+    def submit(self, function, task) -> Future:
+        """Runs a function on a task right away
+
+        Args:
+            function: function of one argument
+            task: argument of the call
+
+        Returns:
+            Future that is already done
+        """
+        future = Future()
+        try:
+            future.set_result(function(task))
+        except Exception as error:  # pylint: disable=W0703
+            future.set_exception(error)
+        return future
+
+    def shutdown(self) -> None:
+        """Releases the workers. Nothing to release in serial mode
+        """
+
+
+class PoolExecutor:
+    """Runs the tasks on a pool of persistent threads or processes
+    """
+
+    def __init__(
+            self, pool_class, num_workers: int, initializer, initargs: tuple
+    ) -> None:
+        """PoolExecutor constructor
+
+        Args:
+            pool_class: ThreadPoolExecutor or ProcessPoolExecutor
+            num_workers: number of workers of the pool
+            initializer: function that sets up the resident data of a worker
+            initargs: arguments of the initializer
+        """
+        self.num_workers = num_workers
+        self.pool = pool_class(
+            max_workers=num_workers, initializer=initializer, initargs=initargs
+        )
+
+    def map(self, function, tasks: list) -> list:
+        """Runs a function on every task
+
+        Args:
+            function: picklable function of one argument
+            tasks: argument of every call
+
+        Returns:
+            list with the result of every task, in task order
+        """
+        chunk_size = max(
+            len(tasks) // (CHUNKS_PER_WORKER * self.num_workers), 1
+        )
+        return list(self.pool.map(function, tasks, chunksize=chunk_size))
+
+    def submit(self, function, task) -> Future:
+        """Queues a function call on a task
+
+        Args:
+            function: picklable function of one argument
+            task: argument of the call
+
+        Returns:
+            Future with the result of the call
+        """
+        return self.pool.submit(function, task)
+
+    def shutdown(self) -> None:
+        """Waits for the pending tasks and stops the workers
+        """
+        self.pool.shutdown()
+
+
+def get_executor(
+        executor_type: str, num_workers: int, initializer, initargs: tuple
+):
+    """Builds the executor of a type
+
+    Args:
+        executor_type: "serial", "thread" or "process"
+        num_workers: number of workers of the pools. 0 uses one per CPU
+        initializer: function that sets up the resident data of a worker.
+                     Thread pools run it in every thread
+        initargs: arguments of the initializer
+
+    Returns:
+        SerialExecutor or PoolExecutor
+    """
+    if num_workers <= 0:
+        num_workers = os.cpu_count()
+
+    if executor_type == "serial":
+        return SerialExecutor(initializer, initargs)
+    if executor_type == "thread":
+        return PoolExecutor(
+            ThreadPoolExecutor, num_workers, initializer, initargs
+        )
+    if executor_type == "process":
+        return PoolExecutor(
+            ProcessPoolExecutor, num_workers, initializer, initargs
+        )
+    raise ValueError(
+        "Not a valid executor type, check the configuration file."
+    )
@@ -0,0 +1,103 @@
+"""Island channel object
+Migration between the islands of an island-model run. Every island has an
+inbox queue, and sends its emigrants to the inboxes of its neighbours in the
+topology. Migrants are organisms in the dictionary format of the organism
+factory, so they carry no caches and get new IDs on the receiving island.
+"""
+
+TOPOLOGIES = ["ring", "full"]
+
+
+def get_island_neighbours(island: int, islands: int, topology: str) -> list:
+    """Islands that receive the emigrants of an island
+
+    Args:
+        island: number of the island
+        islands: number of islands of the run
+        topology: "ring" sends to the next island, "full" sends to all the
+                  other islands
+
+    Returns:
+        list with the number of every receiving island
+    """
+    if topology == "ring":
+        return [(island + 1) % islands]
+    if topology == "full":
+        return [other for other in range(islands) if other != island]
+    raise ValueError(
+        "Not a valid migration topology, check the configuration file."
+    )
+
+
+class IslandChannel:
+    """Sends and receives the migrants of an island. Receiving waits for
+    one message of every sender still running, so a seeded run migrates the
+    same organisms no matter how fast every island goes
+    """
+
+    def __init__(self, island: int, inboxes: list, topology: str) -> None:
+        """IslandChannel constructor
+
+        Args:
+            island: number of the island
+            inboxes: queue of every island of the run
+            topology: "ring" or "full"
+        """
+        self.island = island
+        self.inboxes = inboxes
+        self.receivers = get_island_neighbours(island, len(inboxes), topology)
+        # Messages that arrived before they were needed, by sender
+        self.pending = {
+            sender: []
+            for sender in range(len(inboxes))
+            if island in get_island_neighbours(sender, len(inboxes), topology)
+        }
+
+    def send(self, a_migrants: list) -> None:
+        """Sends emigrants to every receiving island
+
+        Args:
+            a_migrants: organisms in dictionary format
+        """
+        for receiver in self.receivers:
+            self.inboxes[receiver].put(
+                {"island": self.island, "migrants": a_migrants}
+            )
+
+    def receive(self) -> list:
+        """Waits for the immigrants of every sender still running. Senders
+        send once per migration, so their first pending message is always
+        the one of the current migration
+
+        Returns:
+            list of organisms in dictionary format
+        """
+        d_migrants = {}
+        waiting = set(self.pending.keys())
+        while waiting:
+            for sender in sorted(waiting):
+                if self.pending[sender]:
+                    message = self.pending[sender].pop(0)
+                    waiting.discard(sender)
+                    if message["migrants"] is None:
+                        # The sender has finished its run
+                        del self.pending[sender]
+                    else:
+                        d_migrants[sender] = message["migrants"]
+            if waiting:
+                message = self.inboxes[self.island].get()
+                self.pending[message["island"]].append(message)
+
+        # Immigrants are joined in sender order, not in arrival order
+        a_migrants = []
+        for sender in sorted(d_migrants.keys()):
+            a_migrants += d_migrants[sender]
+        return a_migrants
+
+    def close(self) -> None:
+        """Tells the receiving islands that this island has finished
+        """
+        for receiver in self.receivers:
+            self.inboxes[receiver].put(
+                {"island": self.island, "migrants": None}
+            )
@@ -1,6 +1,9 @@
 """Node abstract object to support conector and recognizing objects
 """
 
+# Size in bytes of the structural hash of a subtree
+SUBTREE_HASH_SIZE = 16
+
 
 # pylint: disable=R0903
 class Node:
@@ -10,4 +13,10 @@ class Node:
     """
 
     def __init__(self):
-        pass
+        # Connector that has this node as a child. None for the root node
+        self.parent = None
+        # Number of nodes below the node, including itself
+        self.subtree_size = 1
+        # Hash of the structure and parameters of the subtree, updated when
+        # the organism compiles its program
+        self.subtree_hash = b""
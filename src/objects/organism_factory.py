@@ -7,6 +7,10 @@ import numpy
 from .organism_object import OrganismObject
 from .connector_object import ConnectorObject
 from .pssm_object import PssmObject
+from .encoded_dataset import BASE_CODES
+
+# Order of the bases in PWM columns of JSON files and random columns
+JSON_BASE_ORDER = ["a", "g", "c", "t"]
 
 
 class OrganismFactory:
@@ -136,18 +140,19 @@ class OrganismFactory:
             A pssm with an initializated PWM
         """
 
-        pwm = []
+        pwm = numpy.zeros((length, len(BASE_CODES)))
         # Generate as much as needed
-        for _ in range(length):
-            pwm.append(self.get_pwm_column())
+        for column in range(length):
+            pwm[column] = self.get_pwm_column()
 
-        return PssmObject(numpy.array(pwm), self.conf_pssm)
+        return PssmObject(pwm, self.conf_pssm)
 
-    def get_pwm_column(self) -> dict:
+    def get_pwm_column(self) -> numpy.ndarray:
         """Generates a single column of the pwm
 
         Returns:
-            a random probability for each base [a, c, g, t]
+            a random probability for each base, in BASE_CODES order
+            [a, c, g, t]
         """
 
         initial_probability = (
@@ -194,13 +199,11 @@ class OrganismFactory:
         )
         probabilities = numpy_probabilities.tolist()
 
-        # Return object with "decimals" decimals probability to each base
-        return {
-            "a": round(probabilities[0], decimals),
-            "g": round(probabilities[1], decimals),
-            "c": round(probabilities[2], decimals),
-            "t": round(probabilities[3], decimals),
-        }
+        # Return "decimals" decimals probability to each base
+        column = numpy.zeros(len(BASE_CODES))
+        for base, probability in zip(JSON_BASE_ORDER, probabilities):
+            column[BASE_CODES[base]] = round(probability, decimals)
+        return column
 
     def import_organisms(self, file_name: str) -> list:
         """Import Organisms from file
@@ -217,24 +220,35 @@ class OrganismFactory:
             organism_json = json.load(json_file)
 
         for organism in organism_json:
+            organism_list.append(self.import_organism(organism))
+
+        return organism_list
 
-            new_organism = OrganismObject(self.get_id(), self.conf_org)
-            root_node = None
+    def import_organism(self, organism: dict) -> OrganismObject:
+        """Import Organism from JSON object. It gets a new ID from the
+        factory
 
-            if organism["rootNode"]["objectType"] == "pssm":
-                root_node = self.import_pssm(organism["rootNode"])
-            else:
-                root_node = self.import_connector(organism["rootNode"])
+        Args:
+            organism: organism in dictionary format
 
-            new_organism.set_root_node(root_node)
-            new_organism.reset_ids()
+        Returns:
+            Organism object from given organism dictionary
+        """
+        new_organism = OrganismObject(self.get_id(), self.conf_org)
+        root_node = None
 
-            if "isTracked" in organism.keys():
-                new_organism.set_is_tracked(organism["isTracked"])
+        if organism["rootNode"]["objectType"] == "pssm":
+            root_node = self.import_pssm(organism["rootNode"])
+        else:
+            root_node = self.import_connector(organism["rootNode"])
 
-            organism_list.append(new_organism)
+        new_organism.set_root_node(root_node)
+        new_organism.reset_ids()
 
-        return organism_list
+        if "isTracked" in organism.keys():
+            new_organism.set_is_tracked(organism["isTracked"])
+
+        return new_organism
 
     def import_connector(self, connector: dict) -> ConnectorObject:
         """Import Connector from JSON object
@@ -277,7 +291,12 @@ class OrganismFactory:
             PSSM Object from given  pssm dictionary
 
         """
-        return PssmObject(numpy.array(pssm["pwm"]), self.conf_pssm)
+        pwm = numpy.zeros((len(pssm["pwm"]), len(BASE_CODES)))
+        for column, probabilities in enumerate(pssm["pwm"]):
+            for base, code in BASE_CODES.items():
+                pwm[column, code] = probabilities[base]
+
+        return PssmObject(pwm, self.conf_pssm)
 
     def export_organisms(self, a_organisms: list, filename: str) -> None:
         """Export a list of organisms to JSON format
@@ -288,18 +307,27 @@ class OrganismFactory:
         """
         list_json_organisms = []
         for o_organism in a_organisms:
-            organism = {}
-            if o_organism.root_node.is_connector():
-                organism["rootNode"] = self.export_connector(
-                    o_organism.root_node
-                )
-            else:
-                organism["rootNode"] = self.export_pssm(o_organism.root_node)
-            list_json_organisms.append(organism)
+            list_json_organisms.append(self.export_organism(o_organism))
 
         with open(filename, "w+") as json_file:
             json.dump(list_json_organisms, json_file, indent=2)
 
+    def export_organism(self, o_organism: OrganismObject) -> dict:
+        """Export organism object
+
+        Args:
+            o_organism: Organism to export
+
+        Returns:
+            Organism in dictionary format
+        """
+        organism = {}
+        if o_organism.root_node.is_connector():
+            organism["rootNode"] = self.export_connector(o_organism.root_node)
+        else:
+            organism["rootNode"] = self.export_pssm(o_organism.root_node)
+        return organism
+
     def export_connector(self, o_connector: ConnectorObject) -> dict:
         """Export connector object
 
@@ -339,5 +367,8 @@ class OrganismFactory:
         """
         pssm = {}
         pssm["objectType"] = "pssm"
-        pssm["pwm"] = o_pssm.pwm.tolist()
+        pssm["pwm"] = [
+            {base: column[BASE_CODES[base]] for base in JSON_BASE_ORDER}
+            for column in o_pssm.pwm.tolist()
+        ]
         return pssm
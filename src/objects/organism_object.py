@@ -3,8 +3,16 @@ Oragnism object
 It allocates the full data structure
 """
 
+import copy
 import random
 import numpy as np
+from .encoded_dataset import EncodedDataset, EncodedSequence
+from .placement_set import PlacementSet, get_best_indices
+from .placement_cache import PLACEMENT_CACHE
+
+# Instructions of the compiled evaluation program
+PROGRAM_PSSM = 0
+PROGRAM_CONNECTOR = 1
 
 
 class OrganismObject:
@@ -38,7 +46,16 @@ class OrganismObject:
         ]
         self.min_nodes = conf["MIN_NODES"]
         self.max_nodes = conf["MAX_NODES"]
+        self.placement_mode = conf["PLACEMENT_MODE"]
         self.is_tracked = False
+        # Post-order evaluation program of the tree, compiled on demand
+        self.program = None
+        # Stamp increased on every change of the genome
+        self.genome_version = 0
+        # Energy of every sequence already evaluated, by sequence id. It is
+        # only valid for the genome version it was filled with
+        self.energy_memo: dict = {}
+        self.energy_memo_version = 0
 
     # Setters an getters
     def set_root_node(self, root_node) -> None:
@@ -48,6 +65,8 @@ class OrganismObject:
             root_node (Node): Top-level node for the tree data structure
         """
         self.root_node = root_node
+        self.root_node.parent = None
+        self.set_genome_changed()
 
     def get_id(self) -> int:
         """Getter _id
@@ -65,6 +84,40 @@ class OrganismObject:
         """
         self._id = _id
 
+    def clone(self):
+        """Copies the organism. Nodes are copied, configuration values are
+        shared with the copy
+
+        Returns:
+            OrganismObject with the same _id and genome
+        """
+        new_organism = copy.copy(self)
+        new_organism.set_root_node(self.root_node.clone())
+        # The copy has the same genome, so the memoized energies stay valid
+        new_organism.energy_memo = dict(self.get_energy_memo())
+        new_organism.energy_memo_version = new_organism.genome_version
+        return new_organism
+
+    def set_genome_changed(self) -> None:
+        """Marks the genome as changed. The compiled program is dropped and
+        the energies memoized so far are no longer used
+        """
+        self.program = None
+        self.genome_version += 1
+
+    def get_energy_memo(self) -> dict:
+        """Returns the memoized energies of the current genome, emptying the
+        memo if the genome changed since it was filled
+
+        Returns:
+            dictionary with the energy of every evaluated sequence by
+            sequence id
+        """
+        if self.energy_memo_version != self.genome_version:
+            self.energy_memo = {}
+            self.energy_memo_version = self.genome_version
+        return self.energy_memo
+
     def set_is_tracked(self, new_tracked: bool):
         """Setter is_tracked
 
@@ -88,13 +141,13 @@ class OrganismObject:
             n_nodes = self.count_nodes()
             random_node = random.randint(0, n_nodes - 1)
             substituted_node = self.get_node(random_node)
-            parent_node = self.get_parent(substituted_node._id)
+            parent_node = self.get_parent(substituted_node)
             # TODO: Set the length in the PSSM config
             new_node = org_factory.createPSSM(org_factory.PWM_LENGTH)
 
             if parent_node["is_root_node"]:
 
-                self.root_node = new_node
+                self.set_root_node(new_node)
             else:
 
                 if parent_node["is_left_side"]:
@@ -112,16 +165,16 @@ class OrganismObject:
             n_nodes = self.count_nodes()
             random_node = random.randint(0, n_nodes - 1)
             rised_node = self.get_node(random_node)
-            parent_node = self.get_parent(rised_node._id)
+            parent_node = self.get_parent(rised_node)
 
             #
             if not rised_node._id == self.root_node._id:
 
-                parent1 = self.get_parent(rised_node._id)
-                parent2 = self.get_parent(parent1["self"]._id)
+                parent1 = self.get_parent(rised_node)
+                parent2 = self.get_parent(parent1["self"])
 
                 if parent2["is_root_node"]:
-                    self.root_node = rised_node
+                    self.set_root_node(rised_node)
                 else:
                     if parent2["is_left_side"]:
                         parent2["self"].set_node1(rised_node)
@@ -134,12 +187,12 @@ class OrganismObject:
             n_nodes = self.count_nodes()
             random_node = random.randint(0, n_nodes - 1)
             suken_node = self.get_node(random_node)
-            parent_node = self.get_parent(suken_node._id)
+            parent_node = self.get_parent(suken_node)
 
             new_node = org_factory.create_connection(0)
 
             if parent_node["is_root_node"]:
-                self.root_node = new_node
+                self.set_root_node(new_node)
             else:
                 if parent_node["is_left_side"]:
 
@@ -161,6 +214,9 @@ class OrganismObject:
             mutated_node = self.get_node(random_node)
             mutated_node.mutate(org_factory)
 
+        # Any mutator can change the structure of the tree
+        self.set_genome_changed()
+
     def get_complexity(self, mean_nodes: float, mean_fitness: float) -> float:
         """Returns the implicit complexity assiciated to the  current organism
 
@@ -193,18 +249,22 @@ class OrganismObject:
 
         return base_penalty + extra_penalty
 
-    def get_seq_fitness(self, s_dna: str) -> dict:
+    def get_seq_fitness(
+            self, s_dna: EncodedSequence, batch_scores: dict = None
+    ) -> dict:
         """Return the fitness of the organism for a given DNA sequence
 
         Args:
-            s_dna: DNA sequence to analize
+            s_dna: encoded DNA sequence to analize
+            batch_scores: optional window scores of s_dna by pssm object,
+                          so recognizers do not scan the sequence again
 
         Returns:
            score, blocked and blockers
         """
 
-        # call recursively to get the total fitness of the organism
-        node_root = self.root_node.get_placement_2(s_dna, len(s_dna))
+        # run the compiled tree to get the total fitness of the organism
+        node_root = self.run_program(s_dna, batch_scores)
 
         if len(node_root) < 1:
             print("Too few placement options")
@@ -215,14 +275,208 @@ class OrganismObject:
                     }
 
         # return score, blocks and blokcers in that sequence
-        return node_root[0]
+        return node_root.get_candidate(
+            get_best_indices(node_root.energy, 1)[0]
+        )
+
+    def get_program(self) -> list:
+        """Compiles the tree into a flat post-order program. Every
+        instruction is a pair (PROGRAM_PSSM, pssm) that places a recognizer
+        or a pair (PROGRAM_CONNECTOR, connector) that combines the two last
+        placements. The program is kept until the tree changes. Subtree
+        hashes are updated with every compilation.
+
+        Returns:
+            list of instructions
+        """
+        if self.program is None:
+            self.program = []
+            pending = [(self.root_node, False)]
+            while pending:
+                node, is_expanded = pending.pop()
+                if not node.is_connector():
+                    self.program.append((PROGRAM_PSSM, node))
+                elif is_expanded:
+                    self.program.append((PROGRAM_CONNECTOR, node))
+                else:
+                    pending.append((node, True))
+                    pending.append((node.node2, False))
+                    pending.append((node.node1, False))
+            # Children are hashed before their parents in post-order
+            for _, node in self.program:
+                node.update_subtree_hash()
+        return self.program
+
+    def run_program(
+            self, s_dna: EncodedSequence, batch_scores: dict = None
+    ) -> PlacementSet:
+        """Places the organism on a sequence running the compiled program
+        with a stack of placements, instead of recursing through the tree
+
+        Args:
+            s_dna: encoded DNA sequence to analize
+            batch_scores: optional window scores of s_dna by pssm object
+
+        Returns:
+            placements of the root node
+        """
+        is_anchor = self.placement_mode == "anchor"
+        program = self.get_program()
+        stack = []
+        for index, placements in self.get_program_steps(s_dna):
+            instruction, node = program[index]
+            if placements is not None:
+                # Cached subtree, only the pssm ids may have changed
+                lock_id = np.array([
+                    pssm._id
+                    for pssm_instruction, pssm in program[
+                        index - node.count_nodes() + 1: index + 1
+                    ]
+                    if pssm_instruction == PROGRAM_PSSM
+                ])
+                stack.append(placements.relabel(lock_id))
+                continue
+
+            if instruction == PROGRAM_PSSM:
+                if is_anchor:
+                    placements = node.get_placement_table(s_dna, batch_scores)
+                else:
+                    placements = node.get_placement_2(s_dna, batch_scores)
+            else:
+                placements_2 = stack.pop()
+                placements_1 = stack.pop()
+                if is_anchor:
+                    placements = node.combine_placement_tables(
+                        placements_1, placements_2
+                    )
+                else:
+                    placements = node.combine_placements(
+                        placements_1, placements_2
+                    )
+                if PLACEMENT_CACHE.is_enabled():
+                    PLACEMENT_CACHE.put(
+                        self.get_placement_key(node, s_dna), placements
+                    )
+            stack.append(placements)
+        return stack.pop()
+
+    def get_program_steps(self, s_dna: EncodedSequence) -> list:
+        """Instructions of the program that must run on a sequence. The
+        program is walked backwards from the root, and a subtree found in
+        the placement cache is taken as a whole instead of being run. Only
+        connectors are cached, pssms are placed faster than they are cached
+
+        Args:
+            s_dna: encoded DNA sequence to analize
+
+        Returns:
+            list of pairs (index of the instruction, cached placements or
+            None if the instruction must run), in program order
+        """
+        program = self.get_program()
+        if not PLACEMENT_CACHE.is_enabled():
+            return [(index, None) for index in range(len(program))]
+
+        steps = []
+        index = len(program) - 1
+        while index >= 0:
+            instruction, node = program[index]
+            placements = None
+            if instruction == PROGRAM_CONNECTOR:
+                placements = PLACEMENT_CACHE.get(
+                    self.get_placement_key(node, s_dna)
+                )
+            steps.append((index, placements))
+            if placements is None:
+                index -= 1
+            else:
+                # The subtree takes the instructions before its root
+                index -= node.count_nodes()
+        steps.reverse()
+        return steps
 
-    def get_seq_set_fitness(self, a_dna: list) -> float:
+    def get_placement_key(self, node, s_dna: EncodedSequence) -> tuple:
+        """Key of the placements of a subtree in the placement cache
+
+        Args:
+            node (Node): root of the subtree
+            s_dna: encoded DNA sequence
+
+        Returns:
+            (subtree hash, sequence id, placement mode)
+        """
+        return (node.subtree_hash, s_dna.seq_id, self.placement_mode)
+
+    def get_seq_set_fitness(self, a_dna: EncodedDataset) -> float:
         """Return the total Fitness for an array of DNA sequences and the
         fitness method
 
         Args:
-            a_dna: list of dna sequences
+            a_dna: encoded dna sequences
+
+        Returns:
+            score assigned to the organism
+        """
+
+        # Sequences evaluated with the current genome are not placed again
+        energy_memo = self.get_energy_memo()
+        energies = []
+        for s_dna in a_dna:
+            if s_dna.seq_id not in energy_memo:
+                sfit = self.get_seq_fitness(s_dna)
+                energy_memo[s_dna.seq_id] = sfit["energy"]
+            energies.append(energy_memo[s_dna.seq_id])
+
+        return self.get_cumulative_fitness(energies)
+
+    def get_seq_set_fitness_batch(self, a_dna: EncodedDataset) -> float:
+        """Same as get_seq_set_fitness, but every pssm recognizer scores all
+        the windows of all the sequences in a single vectorized call before
+        the connectors place them sequence by sequence
+
+        Args:
+            a_dna: encoded dna sequences
+
+        Returns:
+            score assigned to the organism
+        """
+
+        # Only the sequences not evaluated with the current genome are
+        # scanned and placed
+        energy_memo = self.get_energy_memo()
+        a_missing = [
+            s_dna for s_dna in a_dna if s_dna.seq_id not in energy_memo
+        ]
+        if len(a_missing) == len(a_dna):
+            # The padded packing of the whole dataset is reused
+            a_missing_dna = a_dna
+        else:
+            a_missing_dna = EncodedDataset(a_missing)
+
+        if a_missing:
+            # Scan the missing sequences once per recognizer
+            d_dataset_scores = {
+                pssm: pssm.get_batch_window_scores(a_missing_dna)
+                for instruction, pssm in self.get_program()
+                if instruction == PROGRAM_PSSM
+            }
+
+            for row, s_dna in enumerate(a_missing_dna):
+                batch_scores = {
+                    pssm: scores[row]
+                    for pssm, scores in d_dataset_scores.items()
+                }
+                sfit = self.get_seq_fitness(s_dna, batch_scores)
+                energy_memo[s_dna.seq_id] = sfit["energy"]
+
+        energies = [energy_memo[s_dna.seq_id] for s_dna in a_dna]
+        return self.get_cumulative_fitness(energies)
+
+    def get_cumulative_fitness(self, energies: list) -> float:
+        """Combines the energies of a set of sequences with the fitness method
+
+        Args:
+            energies: energy of the organism on every sequence
 
         Returns:
             score assigned to the organism
@@ -233,18 +487,13 @@ class OrganismObject:
         # sum method returns the sum of all fitness to DNA sequences
         if self.cumulative_fit_method == "sum":
 
-            for s_dna in a_dna:
-                sfit = self.get_seq_fitness(s_dna)
-                score += sfit["energy"]
+            for energy in energies:
+                score += energy
 
         # mean method returns the mean of all fitness to SNA sequences
         elif self.cumulative_fit_method == "mean":
 
-            scores = []
-            for s_dna in a_dna:
-                sfit = self.get_seq_fitness(s_dna)
-                scores.append(sfit["energy"])
-            score = np.mean(scores)
+            score = np.mean(energies)
 
         return score
 
@@ -270,27 +519,34 @@ class OrganismObject:
 
         print("node._id = {} ID to change {}".format(node._id, _id))
         if self.root_node._id == _id:
-            self.root_node = node
+            self.set_root_node(node)
         else:
             self.root_node.setNode(node, _id)
+        self.set_genome_changed()
 
-    def get_parent(self, _id: int) -> dict:
-        """Get the parent node of a given _id and if it is the left child
+    def get_parent(self, node) -> dict:
+        """Get the parent node of a given node and if it is the left child
 
         Args:
-            _id: ID of the child
+            node (Node): node of the organism
 
         Returns:
             dictionary with the keys:
             "is_root_node": True if its root of the organism. False ortherwise.
-            "self":  Parent node of the _id child
-            "is_left_side": True if ID is from left side of the parent
+            "self":  Parent node of the node
+            "is_left_side": True if the node is on the left side of the parent
         """
 
-        if self.root_node._id == _id:
+        if node is self.root_node:
             return {"is_root_node": True}
 
-        return self.root_node.get_parent(_id)
+        # Ids go stale when a connector swaps its children, so the parent is
+        # read from the node instead of searching the tree for its id
+        return {
+            "is_root_node": False,
+            "self": node.parent,
+            "is_left_side": node.parent.node1 is node,
+        }
 
     def count_nodes(self) -> int:
         """Returns the number of nodes of the organism
@@ -308,6 +564,7 @@ class OrganismObject:
         """
         first_id = 0
         self.root_node.reset_id(first_id)
+        self.set_genome_changed()
 
     def print(self) -> None:
         """Prints the whole tree data structure
@@ -329,12 +586,12 @@ class OrganismObject:
         organism_file.write("\n")
         organism_file.close()
 
-    def export_results(self, a_dna: list, filename: str) -> None:
+    def export_results(self, a_dna: EncodedDataset, filename: str) -> None:
         """Exports all DNA sequences organism binding to a file
 
         Args:
             filename: Name of the file to export sequences
-            a_dna: list fo sequences to export
+            a_dna: encoded sequences to export
 
         """
 
@@ -348,13 +605,13 @@ class OrganismObject:
         for s_dna in a_dna:
 
             # call fitness evaluation for sequence
-            sfit = self.get_seq_fitness(s_dna.lower())
+            sfit = self.get_seq_fitness(s_dna)
 
             # write out the sequence
-            results_file.write("\n{}\n".format(s_dna))
+            results_file.write("\n{}\n".format(s_dna.sequence))
 
             # create an empy positions map
-            map_positions = "-" * len(s_dna)
+            map_positions = "-" * s_dna.length
 
             # positions for PSSMs are in blocks and blocked lists, returned by
             # getSeqFitness. we zip them and then iterate over the zip to
@@ -376,23 +633,21 @@ class OrganismObject:
 
         results_file.close()
 
-    def print_result(self, s_dna: str) -> str:
+    def print_result(self, s_dna: EncodedSequence) -> str:
         """Prints the results of s_dna binding sites to stdout
 
         Args:
-            s_dna: DNA sequence to export
+            s_dna: encoded DNA sequence to export
 
         Returns:
             DNA sequence and binding sites of the organisms recognizer
         """
 
-        s_dna = s_dna.lower()
-
         # call fitness evaluation for sequence
-        sfit = self.get_seq_fitness(s_dna.lower())
+        sfit = self.get_seq_fitness(s_dna)
 
         # create an empy positions map
-        map_positions = "-" * len(s_dna)
+        map_positions = "-" * s_dna.length
         
         # positions for PSSMs are in blocked and blocked lists, returned by
         # getSeqFitness. we zip them and then iterate over the zip to
@@ -410,4 +665,4 @@ class OrganismObject:
             # handle two-digit positions, by alterning between digits
 
         # return map for this sequence
-        return "{}\n{}".format(s_dna, map_positions)
+        return "{}\n{}".format(s_dna.sequence.lower(), map_positions)
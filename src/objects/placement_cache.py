@@ -0,0 +1,48 @@
+"""Placement cache object
+Process-wide cache of the placements of organism subtrees. Entries are
+addressed by the structural hash of the subtree, so a subtree that a child
+inherits unchanged from its parent is not placed again on the same sequence.
+"""
+
+from objects.score_cache import ScoreCache, ENTRY_OVERHEAD_BYTES
+from objects.placement_set import PlacementSet
+
+# Approximate memory used by the object and array headers of a placement set
+PLACEMENT_SET_OVERHEAD_BYTES = 1024
+
+
+class PlacementCache(ScoreCache):
+    """LRU cache of placement sets with a memory cap
+    """
+
+    def get_entry_bytes(self, placements: PlacementSet) -> int:
+        """Memory counted against the cap for an entry
+
+        Args:
+            placements: cached placement set
+
+        Returns:
+            bytes of the arrays of the set plus the bookkeeping of the entry
+        """
+        return (
+            placements.energy.nbytes
+            + placements.position.nbytes
+            + placements.lock_position.nbytes
+            + placements.lock_reverse.nbytes
+            + placements.occupancy.nbytes
+            + PLACEMENT_SET_OVERHEAD_BYTES
+            + ENTRY_OVERHEAD_BYTES
+        )
+
+    def set_read_only(self, placements: PlacementSet) -> None:
+        """Protects a cached entry, since every hit shares it
+
+        Args:
+            placements: placement set stored in the cache
+        """
+        for array in placements.get_arrays():
+            array.flags.writeable = False
+
+
+# Cache shared by all the organisms of the process
+PLACEMENT_CACHE = PlacementCache()
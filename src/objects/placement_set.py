@@ -0,0 +1,246 @@
+"""Placement set object
+Candidate placements of a node on a DNA sequence, stored as arrays so
+connectors can combine them with broadcasting
+"""
+
+import numpy as np
+
+# Sequence positions packed in every word of an occupancy mask
+BITS_PER_WORD = 64
+
+
+def get_best_indices(values: np.ndarray, count: int) -> np.ndarray:
+    """Indices of the highest values, sorted by descending value. Ties keep
+    the order of the array, as a stable sort would
+
+    Args:
+        values: 1-D array of values
+        count: maximum number of indices returned
+
+    Returns:
+        array with the indices of the best count values
+    """
+    if count == 1 and len(values) > 0:
+        # argmax returns the first maximum, same as a stable sort
+        return np.array([np.argmax(values)])
+    if count < len(values):
+        # Only the values that reach the count-th best one are sorted
+        threshold = np.partition(values, len(values) - count)[
+            len(values) - count
+        ]
+        candidates = np.flatnonzero(values >= threshold)
+        return candidates[
+            np.argsort(-values[candidates], kind="stable")[:count]
+        ]
+    return np.argsort(-values, kind="stable")[:count]
+
+
+def get_row_pairs(counts: np.ndarray) -> tuple:
+    """Pairs (i, j) with j below counts[i], in row-major order
+
+    Args:
+        counts: number of pairs of every row
+
+    Returns:
+        row index and column index of every pair
+    """
+    rows = np.repeat(np.arange(len(counts)), counts)
+    row_starts = np.cumsum(counts) - counts
+    return rows, np.arange(len(rows)) - row_starts[rows]
+
+
+def get_occupancy(
+        positions: np.ndarray, length: int, sequence_length: int
+) -> np.ndarray:
+    """Builds the occupancy masks of windows of a sequence. Bit i of a mask
+    is set if the window covers position i of the sequence
+
+    Args:
+        positions: starting position of every window
+        length: number of bases of the windows
+        sequence_length: number of bases of the sequence
+
+    Returns:
+        (words, windows) array of masks packed in uint64 words, one column
+        per window so pairs of masks can be reduced over the first axis
+    """
+    num_words = -(-sequence_length // BITS_PER_WORD)
+    window_mask = (1 << length) - 1
+    masks = b"".join(
+        (window_mask << position).to_bytes(num_words * 8, "little")
+        for position in positions.tolist()
+    )
+    return np.frombuffer(masks, dtype="<u8").reshape(
+        len(positions), num_words
+    ).T
+
+
+class PlacementSet:
+    """Set of candidate placements sorted by descending energy. Every
+    candidate places all the pssm recognizers below the node, in the same
+    order as their lock vector. The sequence positions taken by those pssms
+    are kept as a bit mask, so testing two candidates for overlaps is a
+    single AND and merging them is a single OR
+    """
+
+    # pylint: disable=R0913
+    def __init__(
+            self,
+            energy: np.ndarray,
+            position: np.ndarray,
+            lock_position: np.ndarray,
+            lock_reverse: np.ndarray,
+            lock_id: np.ndarray,
+            lock_length: np.ndarray,
+            occupancy: np.ndarray,
+    ) -> None:
+        """PlacementSet constructor
+
+        Args:
+            energy: (candidates,) energy of every candidate
+            position: (candidates,) position of every candidate
+            lock_position: (candidates, pssms) starting position of every
+                           pssm of every candidate
+            lock_reverse: (candidates, pssms) True if the pssm is placed on
+                          the reverse strand
+            lock_id: (pssms,) id of every pssm
+            lock_length: (pssms,) length of every pssm
+            occupancy: (words, candidates) occupancy mask of every
+                       candidate, built by get_occupancy
+        """
+        self.energy = energy
+        self.position = position
+        self.lock_position = lock_position
+        self.lock_reverse = lock_reverse
+        self.lock_id = lock_id
+        self.lock_length = lock_length
+        self.occupancy = occupancy
+
+    # pylint: enable=R0913
+    def get_candidate(self, index: int) -> dict:
+        """Builds the readable description of a candidate
+
+        Args:
+            index: number of the candidate
+
+        Returns:
+            dictionary format of the candidate:
+                "energy": Energy of the candidate
+                "position": Position of the candidate in the dna sequence
+                "lock_vector": list with the information of blocked pssm
+                    "id": id of the pssm
+                    "position": starting position of the pssm
+                    "length": length of the pssm
+                    "strand": "+" or "-" if the reverse complement won
+        """
+        lock_vector = []
+        for pssm in range(len(self.lock_id)):
+            lock_vector.append({
+                "id": int(self.lock_id[pssm]),
+                "position": int(self.lock_position[index, pssm]),
+                "length": int(self.lock_length[pssm]),
+                "strand": "-" if self.lock_reverse[index, pssm] else "+",
+            })
+
+        return {
+            "energy": float(self.energy[index]),
+            "position": float(self.position[index]),
+            "lock_vector": lock_vector,
+        }
+
+    def pair_with(
+            self,
+            other,
+            index_1: np.ndarray,
+            index_2: np.ndarray,
+            energy: np.ndarray,
+    ):
+        """Builds the set of candidates made by pairing candidates of this
+        set with candidates of another set. The position of a pair is the
+        middle point of the two candidates
+
+        Args:
+            other (PlacementSet): candidates of the other node
+            index_1: candidate of this set of every pair
+            index_2: candidate of the other set of every pair
+            energy: energy of every pair
+
+        Returns:
+            PlacementSet with one candidate per pair
+        """
+        return PlacementSet(
+            energy,
+            (self.position[index_1] + other.position[index_2]) / 2,
+            np.concatenate(
+                (self.lock_position[index_1], other.lock_position[index_2]),
+                axis=1,
+            ),
+            np.concatenate(
+                (self.lock_reverse[index_1], other.lock_reverse[index_2]),
+                axis=1,
+            ),
+            np.concatenate((self.lock_id, other.lock_id)),
+            np.concatenate((self.lock_length, other.lock_length)),
+            self.occupancy[:, index_1] | other.occupancy[:, index_2],
+        )
+
+    def get_arrays(self) -> tuple:
+        """Returns all the arrays of the set
+
+        Returns:
+            tuple with energy, position, lock_position, lock_reverse,
+            lock_id, lock_length and occupancy
+        """
+        return (
+            self.energy,
+            self.position,
+            self.lock_position,
+            self.lock_reverse,
+            self.lock_id,
+            self.lock_length,
+            self.occupancy,
+        )
+
+    def get_rows(self, start: int, stop: int):
+        """Candidates from start up to stop. Arrays are views of the arrays
+        of this set
+
+        Args:
+            start: first candidate
+            stop: candidate after the last one
+
+        Returns:
+            PlacementSet with the candidates in the range
+        """
+        return PlacementSet(
+            self.energy[start:stop],
+            self.position[start:stop],
+            self.lock_position[start:stop],
+            self.lock_reverse[start:stop],
+            self.lock_id,
+            self.lock_length,
+            self.occupancy[:, start:stop],
+        )
+
+    def relabel(self, lock_id: np.ndarray):
+        """Same candidates with other pssm ids. Arrays are shared with this
+        set
+
+        Args:
+            lock_id: (pssms,) id of every pssm
+
+        Returns:
+            PlacementSet with the new ids
+        """
+        return PlacementSet(
+            self.energy,
+            self.position,
+            self.lock_position,
+            self.lock_reverse,
+            lock_id,
+            self.lock_length,
+            self.occupancy,
+        )
+
+    def __len__(self) -> int:
+        return len(self.energy)
@@ -1,10 +1,26 @@
 """P object
 Saves al specific PSSM data structure
 """
+import copy
 import random
-from objects.node_object import Node
+import hashlib
+from objects.node_object import Node, SUBTREE_HASH_SIZE
+from objects.encoded_dataset import (
+    BASE_CODES,
+    EncodedDataset,
+    EncodedSequence,
+)
+from objects.score_cache import SCORE_CACHE
+from objects.placement_set import (
+    PlacementSet,
+    get_best_indices,
+    get_occupancy,
+)
 import numpy as np
 
+# Size in bytes of the content hash of a PSSM
+CONTENT_HASH_SIZE = 16
+
 
 class PssmObject(Node):
     """PSSM object
@@ -14,15 +30,23 @@ class PssmObject(Node):
         """PSSM constructor
 
         Args:
-            pwm (numpy.array): PWM
+            pwm (numpy.array): PWM, (length, 4) array of probabilities with
+                               the bases in BASE_CODES order
             config: configuration from JSON file
         """
 
         super().__init__()
         self._id = 0
         self.length = len(pwm)  # length of the numpy array
-        self.pwm = pwm  # numpy array of dictionaries
+        self.pwm = pwm  # (length, 4) float array
+        # (length, 4) score matrices indexed by [column, base code]
         self.pssm = None
+        self.reverse_complement_pssm = None
+        # Hash of the PSSM content, used to share cached scores
+        self.content_hash = b""
+        # Score of every possible k-mer and strand table for short PSSMs,
+        # see get_kmer_tables. Built on first use and never pickled
+        self.kmer_tables = None
         self.optimal_combination: list = []
         self.mutate_probability_random_col = config[
             "MUTATE_PROBABILITY_RANDOM_COL"
@@ -43,6 +67,7 @@ class PssmObject(Node):
         self.placement_options = config["PLACEMENT_OPTIONS"]
         self.upper_print_probability = config["UPPER_PRINT_PROBABILITY"]
         self.scan_reverse_complement = config["SCAN_REVERSE_COMPLEMENT"]
+        self.kmer_table_max_length = config["KMER_TABLE_MAX_LENGTH"]
         # It first calculates PSSM Matrix based on  pwm
         self.recalculate_pssm()
 
@@ -68,17 +93,6 @@ class PssmObject(Node):
         """
         return self if objective == node_count else None
 
-    def get_parent(self, _id: int) -> Node:
-        """pssm objects cannot be parents
-
-        Args:
-            _id: Id of the child node
-
-        Returns:
-            Node with ID _id. PSSM recognizers cannot be parents.
-        """
-        return None
-
     def get_length(self) -> int:
         """Length of the pssm recognizer
 
@@ -87,12 +101,26 @@ class PssmObject(Node):
         """
         return self.length
 
+    def clone(self):
+        """Copies the recognizer. The pwm is shared until one of the copies
+        mutates, and the score matrices, tables and hash are never modified
+        in place, so they are shared by both copies
+
+        Returns:
+            PssmObject with the same genome and no parent
+        """
+        new_pssm = copy.copy(self)
+        new_pssm.parent = None
+        return new_pssm
+
     def mutate(self, org_factory) -> None:
         """Mutation operators associated to the PSSM recognizer
 
         Args:
             org_factory (OrganismFactory): Cretes organisms and Node components
         """
+        # The pwm may be shared with clones of the recognizer
+        self.pwm = self.pwm.copy()
 
         if random.random() < self.mutate_probability_random_col:
 
@@ -108,30 +136,24 @@ class PssmObject(Node):
 
             col1, col2 = random.sample(range(self.length), 2)
             # Select two random columns and swap it
-            tmp_col = self.pwm[col1]
-            self.pwm[col1] = self.pwm[col2]
-            self.pwm[col2] = tmp_col
+            self.pwm[[col1, col2]] = self.pwm[[col2, col1]]
 
         if random.random() < self.mutate_probability_flip_rows:
             # Flip two rows
-            # Save values of two rows and swap it (its gonna be one by one)
             bases = ["a", "c", "g", "t"]
             random.shuffle(bases)
-            base1, base2 = bases[:2]
+            row1, row2 = BASE_CODES[bases[0]], BASE_CODES[bases[1]]
 
             # Swap rows
-            for i in range(self.length):
-                tmp_base = self.pwm[i][base1]
-                self.pwm[i][base1] = self.pwm[i][base2]
-                self.pwm[i][base2] = tmp_base
+            self.pwm[:, [row1, row2]] = self.pwm[:, [row2, row1]]
 
         if random.random() < self.mutate_probability_shift_left:
             # Shift to right/left
-            self.pwm = np.roll(self.pwm, -1)
+            self.pwm[:] = np.roll(self.pwm, -1, axis=0)
 
         if random.random() < self.mutate_probability_shift_right:
             # Shift to right/left
-            self.pwm = np.roll(self.pwm, 1)
+            self.pwm[:] = np.roll(self.pwm, 1, axis=0)
 
         self.recalculate_pssm()
 
@@ -139,45 +161,37 @@ class PssmObject(Node):
     def recalculate_pssm(self) -> None:
         """ Calculates the PSSM based on the pwm values
         """
-        tmp_pssm = []
-        for column in self.pwm:
-            # From pwm to pssm
-            # log2(base/0.25) = log2(4.0*base)
-            decimals = 2
-            tmp_bases = []
-            # cast to float so round function does not become crazy
-            tmp_bases.append(
-                float(np.log2(4.0 * column["c"] + self.pseudo_count))
-            )
-            tmp_bases.append(
-                float(np.log2(4.0 * column["t"] + self.pseudo_count))
-            )
-            tmp_bases.append(
-                float(np.log2(4.0 * column["g"] + self.pseudo_count))
-            )
-            tmp_bases.append(
-                float(np.log2(4.0 * column["a"] + self.pseudo_count))
-            )
-
-            tmp_pssm.append(
-                {
-                    "c": round(tmp_bases[0], decimals),
-                    "t": round(tmp_bases[1], decimals),
-                    "g": round(tmp_bases[2], decimals),
-                    "a": round(tmp_bases[3], decimals),
-                }
-            )
-        self.pssm = np.array(tmp_pssm)
+        # From pwm to pssm
+        # log2(base/0.25) = log2(4.0*base)
+        decimals = 2
+        log_odds = np.log2(4.0 * self.pwm + self.pseudo_count)
+        # Python round on every value, so scores do not depend on how NumPy
+        # rounds decimals
+        self.pssm = np.array(
+            [
+                [round(value, decimals) for value in column]
+                for column in log_odds.tolist()
+            ]
+        )
+        # Complementary base codes add up to 3, so reversing both axes gives
+        # the matrix that scores a window as its reverse complement
+        self.reverse_complement_pssm = np.ascontiguousarray(
+            self.pssm[::-1, ::-1]
+        )
+        self.content_hash = hashlib.blake2b(
+            self.pssm.tobytes(), digest_size=CONTENT_HASH_SIZE
+        ).digest()
+        self.kmer_tables = None
         # Also calculate the optimal pssm combinations
         self.optimal_combination = [""]
-        for position in tmp_pssm:
+        for position in self.pssm:
             max_bases = []
             max_base_score = float("-inf")
-            for base in position:
-                if position[base] > max_base_score:
+            for base in "ctga":
+                if position[BASE_CODES[base]] > max_base_score:
                     max_bases = [base]
-                    max_base_score = position[base]
-                elif position[base] == max_base_score:
+                    max_base_score = position[BASE_CODES[base]]
+                elif position[BASE_CODES[base]] == max_base_score:
                     max_bases.append(base)
 
             tmp_optimal = []
@@ -188,6 +202,94 @@ class PssmObject(Node):
             self.optimal_combination = tmp_optimal
         # print(self.optimal_combination)
 
+    def update_subtree_hash(self) -> None:
+        """Hashes the PSSM together with the settings that change its
+        placements
+        """
+        settings = (self.placement_options, self.scan_reverse_complement)
+        self.subtree_hash = hashlib.blake2b(
+            self.content_hash + repr(settings).encode(),
+            digest_size=SUBTREE_HASH_SIZE,
+        ).digest()
+
+    def get_kmer_tables(self) -> tuple:
+        """Scores every possible k-mer of the length of the PSSM, so scanning
+        becomes a single lookup per window. The table is indexed by the
+        k-mer codes of EncodedSequence. If the reverse complement is scanned,
+        the best of both scores is folded into the table and the winning
+        strand is kept in the strand table. Tables are built the first time
+        they are needed after a mutation.
+
+        Returns:
+            k-mer table and strand table. The strand table is True where the
+            reverse complement scores best, and None if the reverse
+            complement is not scanned. (None, None) for PSSMs longer than
+            kmer_table_max_length
+        """
+        if self.length > self.kmer_table_max_length:
+            return None, None
+        if self.kmer_tables is not None:
+            return self.kmer_tables
+
+        num_bases = len(BASE_CODES)
+        # Base codes of column j vary along axis j, so the scores of all the
+        # k-mers are added up at once by broadcasting
+        column_codes = []
+        for column in range(self.length):
+            axis_shape = [1] * self.length
+            axis_shape[column] = num_bases
+            column_codes.append(np.arange(num_bases).reshape(axis_shape))
+
+        forward_scores, reverse_scores = self.score_columns(
+            column_codes, (num_bases,) * self.length
+        )
+        kmer_table = forward_scores.ravel()
+        kmer_strand_table = None
+
+        if reverse_scores is not None:
+            reverse_scores = reverse_scores.ravel()
+            kmer_strand_table = reverse_scores > kmer_table
+            kmer_table = np.maximum(kmer_table, reverse_scores)
+        # Published once complete, since threads may share the pssm
+        self.kmer_tables = (kmer_table, kmer_strand_table)
+        return self.kmer_tables
+
+    def __getstate__(self) -> dict:
+        # K-mer tables are larger than the rest of the pssm, so processes
+        # that receive it build them again
+        state = self.__dict__.copy()
+        state["kmer_tables"] = None
+        return state
+
+    def score_columns(self, column_codes: list, shape: tuple) -> tuple:
+        """Adds up the column scores of a set of windows. Forward and reverse
+        complement scores are accumulated in the same pass over the columns.
+
+        Args:
+            column_codes: for every column of the PSSM, an array with the
+                          base code of that column in every window
+            shape: shape of the set of windows
+
+        Returns:
+            forward scores and reverse complement scores of every window.
+            Reverse scores are None if the reverse complement is not scanned
+        """
+        forward_scores = np.zeros(shape)
+        reverse_scores = None
+        if self.scan_reverse_complement:
+            reverse_scores = np.zeros(shape)
+
+        for column in range(self.length):
+            forward_scores += self.pssm[column, column_codes[column]]
+            if reverse_scores is not None:
+                # Reverse complement is added up from its own first base
+                reverse_column = self.length - column - 1
+                reverse_scores += self.reverse_complement_pssm[
+                    reverse_column, column_codes[reverse_column]
+                ]
+
+        return forward_scores, reverse_scores
+
     def get_placement(
             self, s_dna: str, s_dna_len: int, blocks: list, blockers: list
     ) -> dict:
@@ -248,46 +350,263 @@ class PssmObject(Node):
         }
 
     def get_placement_2(
-            self, s_dna: str, s_dna_len: int
-    ) -> list:
+            self, s_dna: EncodedSequence, batch_scores: dict = None
+    ) -> PlacementSet:
         """Sets the pssm in the DNA sequence.
         Iterate over the whole sequence and select the best N sites
 
         Args:
-            s_dna: DNA sequence
-            s_dna_len: lenght of the dna sequence
+            s_dna: encoded DNA sequence
+            batch_scores: optional window scores of s_dna already computed
+                          by get_batch_window_scores, by pssm object
 
         Returns:
-            The N (placement_options configured) best options in dictionary
-            format:
-                "energy": Energy of the pssm
-                "position": Position of the pssm in the dna sequence
-                "lock_vector": list with the information of blocked pssm
-                    "ID": id of the pssm
-                    "position": starting position of the pssm
-                    "length": length of the pssm
+            The N (placement_options configured) best options, sorted by
+            energy. Each one locks this pssm at its starting position
         """
-        possible_candidates = []
-        pssm_length = self.length
-        num_binding_sites = s_dna_len - pssm_length
-
-        for pos in range(num_binding_sites):
-            possible_candidates.append(
-                {
-                    "position": pos + (pssm_length/2),
-                    "energy": self.get_score(
-                        s_dna[pos: pos + pssm_length]
-                    ),
-                    "lock_vector": [{
-                        "id": self._id,
-                        "position": pos,
-                        "length": pssm_length
-                        }]
-                    }
+        scores = self.get_site_scores(s_dna, batch_scores)
+
+        # Ties keep the first position, as the list sort did
+        best_positions = get_best_indices(scores, self.placement_options)
+
+        return self.get_placement_set(s_dna, scores, best_positions)
+
+    def get_placement_table(
+            self, s_dna: EncodedSequence, batch_scores: dict = None
+    ) -> PlacementSet:
+        """Anchor placement. Every binding site of the sequence is a
+        candidate
+
+        Args:
+            s_dna: encoded DNA sequence
+            batch_scores: optional window scores of s_dna already computed
+                          by get_batch_window_scores, by pssm object
+
+        Returns:
+            one option per binding site, sorted by position
+        """
+        scores = self.get_site_scores(s_dna, batch_scores)
+
+        return self.get_placement_set(
+            s_dna, scores, np.arange(len(scores))
+        )
+
+    def get_site_scores(
+            self, s_dna: EncodedSequence, batch_scores: dict = None
+    ) -> np.ndarray:
+        """Score of every binding site of the sequence
+
+        Args:
+            s_dna: encoded DNA sequence
+            batch_scores: optional window scores of s_dna already computed
+                          by get_batch_window_scores, by pssm object
+
+        Returns:
+            array with the score of the window starting at every position
+        """
+        num_binding_sites = s_dna.length - self.length
+
+        if num_binding_sites < 1:
+            return np.zeros(0)
+        if batch_scores is None:
+            return self.get_window_scores(s_dna, num_binding_sites)
+        return batch_scores[self][:num_binding_sites]
+
+    def get_placement_set(
+            self,
+            s_dna: EncodedSequence,
+            scores: np.ndarray,
+            positions: np.ndarray,
+    ) -> PlacementSet:
+        """Builds the candidates that lock this pssm at some positions
+
+        Args:
+            s_dna: encoded DNA sequence
+            scores: score of every binding site of the sequence
+            positions: starting position of every candidate
+
+        Returns:
+            PlacementSet with one candidate per position
+        """
+        return PlacementSet(
+            scores[positions],
+            positions + (self.length/2),
+            positions[:, np.newaxis],
+            self.get_reverse_strands(s_dna, positions)[:, np.newaxis],
+            np.array([self._id]),
+            np.array([self.length]),
+            get_occupancy(positions, self.length, s_dna.length),
+        )
+
+    def get_reverse_strands(
+            self, s_dna: EncodedSequence, positions: np.ndarray
+    ) -> np.ndarray:
+        """Strand that gives the score of a set of windows
+
+        Args:
+            s_dna: encoded DNA sequence
+            positions: starting position of every window
+
+        Returns:
+            boolean array, True where the reverse complement of the window
+            scores better than the window itself
+        """
+        if not self.scan_reverse_complement:
+            return np.zeros(len(positions), dtype=bool)
+
+        _, kmer_strand_table = self.get_kmer_tables()
+        if kmer_strand_table is not None:
+            return kmer_strand_table[
+                s_dna.get_kmer_codes(self.length)[positions]
+            ]
+
+        windows = s_dna.get_windows(self.length)[positions]
+        forward_scores, reverse_scores = self.score_columns(
+            [windows[:, column] for column in range(self.length)],
+            (len(positions),),
+        )
+        return reverse_scores > forward_scores
+
+    def get_cache_key(self, s_dna: EncodedSequence) -> tuple:
+        """Key of the scores of a sequence in the score cache
+
+        Args:
+            s_dna: encoded DNA sequence
+
+        Returns:
+            (content hash, sequence id, strand mode)
+        """
+        return (self.content_hash, s_dna.seq_id, self.scan_reverse_complement)
+
+    def get_window_scores(
+            self, s_dna: EncodedSequence, num_binding_sites: int
+    ) -> np.ndarray:
+        """Window scores of a sequence, taken from the score cache if a PSSM
+        with the same content has already scanned it
+
+        Args:
+            s_dna: encoded DNA sequence
+            num_binding_sites: number of windows to score
+
+        Returns:
+            array with the score of the window starting at every position
+        """
+        if not SCORE_CACHE.is_enabled():
+            return self.scan_window_scores(s_dna, num_binding_sites)
+
+        cache_key = self.get_cache_key(s_dna)
+        scores = SCORE_CACHE.get(cache_key)
+        if scores is None:
+            scores = self.scan_window_scores(s_dna, num_binding_sites)
+            SCORE_CACHE.put(cache_key, scores)
+        return scores
+
+    def scan_window_scores(
+            self, s_dna: EncodedSequence, num_binding_sites: int
+    ) -> np.ndarray:
+        """Scores all the windows of an encoded sequence at once.
+        Short PSSMs look every window up in the k-mer table. Otherwise columns
+        are accumulated one by one over all the windows, so every window score
+        is added up in the same order as get_score does.
+
+        Args:
+            s_dna: encoded DNA sequence
+            num_binding_sites: number of windows to score
+
+        Returns:
+            array with the score of the window starting at every position
+        """
+        kmer_table, _ = self.get_kmer_tables()
+        if kmer_table is not None:
+            return kmer_table[
+                s_dna.get_kmer_codes(self.length)[:num_binding_sites]
+            ]
+
+        windows = s_dna.get_windows(self.length)[:num_binding_sites]
+        forward_scores, reverse_scores = self.score_columns(
+            [windows[:, column] for column in range(self.length)],
+            (num_binding_sites,),
+        )
+
+        if reverse_scores is None:
+            return forward_scores
+        return np.maximum(forward_scores, reverse_scores)
+
+    def get_batch_window_scores(self, a_dna: EncodedDataset) -> np.ndarray:
+        """Window scores of all the sequences of a dataset. If every sequence
+        is in the score cache the rows are taken from it, otherwise the whole
+        dataset is scanned at once and the missing rows are cached.
+
+        Args:
+            a_dna: encoded DNA sequences
+
+        Returns:
+            (num_sequences, num_windows) array of scores. Row i holds the
+            scores of sequence i, windows past its last binding site are -inf
+        """
+        if not SCORE_CACHE.is_enabled():
+            return self.scan_batch_window_scores(a_dna)
+
+        a_cache_keys = [self.get_cache_key(s_dna) for s_dna in a_dna]
+        a_rows = [SCORE_CACHE.get(cache_key) for cache_key in a_cache_keys]
+
+        if all(row is not None for row in a_rows):
+            padded_codes, _ = a_dna.get_padded_codes()
+            max_binding_sites = max(padded_codes.shape[1] - self.length, 0)
+            scores = np.full((len(a_rows), max_binding_sites), -np.inf)
+            for index, row in enumerate(a_rows):
+                scores[index, :len(row)] = row
+            return scores
+
+        scores = self.scan_batch_window_scores(a_dna)
+        for index, s_dna in enumerate(a_dna):
+            if a_rows[index] is None:
+                num_binding_sites = max(s_dna.length - self.length, 0)
+                SCORE_CACHE.put(
+                    a_cache_keys[index],
+                    scores[index, :num_binding_sites].copy(),
                 )
-        possible_candidates.sort(key=lambda c: c["energy"], reverse=True)
+        return scores
 
-        return possible_candidates[:self.placement_options]
+    def scan_batch_window_scores(self, a_dna: EncodedDataset) -> np.ndarray:
+        """Scores all the windows of all the sequences of a dataset in one
+        vectorized pass over the padded codes of the dataset
+
+        Args:
+            a_dna: encoded DNA sequences
+
+        Returns:
+            (num_sequences, num_windows) array of scores. Row i holds the
+            scores of sequence i, windows past its last binding site are -inf
+        """
+        padded_codes, lengths = a_dna.get_padded_codes()
+        num_binding_sites = lengths - self.length
+        max_binding_sites = max(padded_codes.shape[1] - self.length, 0)
+
+        kmer_table, _ = self.get_kmer_tables()
+        if kmer_table is not None:
+            scores = kmer_table[
+                a_dna.get_padded_kmer_codes(self.length)[
+                    :, :max_binding_sites
+                ]
+            ]
+        else:
+            scores, reverse_scores = self.score_columns(
+                [
+                    padded_codes[:, column: column + max_binding_sites]
+                    for column in range(self.length)
+                ],
+                (len(lengths), max_binding_sites),
+            )
+            if reverse_scores is not None:
+                scores = np.maximum(scores, reverse_scores)
+
+        # Mask the windows that fall on the padding
+        scores[
+            np.arange(max_binding_sites) >= num_binding_sites[:, np.newaxis]
+        ] = -np.inf
+
+        return scores
 
     def get_all_pssm(self) -> list:
         """Adds himself as a pssm recognizer
@@ -309,16 +628,15 @@ class PssmObject(Node):
 
         """
 
-        complement = {"a": "t", "t": "a", "g": "c", "c": "g"}
         # gets a score from pssm
         score = 0
         score_reverse = 0
         str_length = len(s_dna)
         for i in range(str_length):
 
-            score += self.pssm[i][s_dna[i]]
-            score_reverse += self.pssm[str_length - i - 1][
-                complement[s_dna[str_length - i - 1]]
+            score += self.pssm[i, BASE_CODES[s_dna[i]]]
+            score_reverse += self.reverse_complement_pssm[
+                str_length - i - 1, BASE_CODES[s_dna[str_length - i - 1]]
             ]
         # Returns the max binding score
         return (
@@ -348,11 +666,12 @@ class PssmObject(Node):
         self._id = new_id
         return new_id + 1
 
-    def print(self, distance: int) -> None:
-        """Print PSSM object (similar to Logo format)
+    def get_consensus(self) -> str:
+        """Most probable base on every position. Bases are uppercase if their
+        probability reaches upper_print_probability
 
-        Args:
-            distance: Depth in the tree
+        Returns:
+            consensus sequence of the pwm
         """
 
         recognized = ""
@@ -360,15 +679,24 @@ class PssmObject(Node):
         for position in self.pwm:
             base = "a"
             # Find max base
-            for new_base in position.keys():
-                if position[new_base] > position[base]:
+            for new_base in "agct":
+                if position[BASE_CODES[new_base]] > position[BASE_CODES[base]]:
                     base = new_base
-
-            if position[base] >= self.upper_print_probability:
+            # Change to uppercase based on probability
+            if position[BASE_CODES[base]] >= self.upper_print_probability:
                 base = base.upper()
             recognized += base
 
-        print("   |" * distance + " - " + recognized)
+        return recognized
+
+    def print(self, distance: int) -> None:
+        """Print PSSM object (similar to Logo format)
+
+        Args:
+            distance: Depth in the tree
+        """
+
+        print("   |" * distance + " - " + self.get_consensus())
 
     def export(self, export_file, level: int) -> None:
         """Exports pssm to a file
@@ -377,20 +705,8 @@ class PssmObject(Node):
             export_file: File to write the output
             level: Depth in the tree
         """
-        recognized = ""
-
-        for position in self.pwm:
-            base = "a"
-            # Find max base
-            for new_base in position.keys():
-                if position[new_base] > position[base]:
-                    base = new_base
-            # Change to uppercase based on probability
-            if position[base] >= self.upper_print_probability:
-                base = base.upper()
-            recognized += base
 
-        export_file.write("\n" + "   |" * level + " - " + recognized)
+        export_file.write("\n" + "   |" * level + " - " + self.get_consensus())
         # exportFile.write("\n")
 
     # pylint: disable=R0201
@@ -0,0 +1,172 @@
+"""Score cache object
+Process-wide cache of the window scores of PSSM recognizers. Entries are
+addressed by the content of the PSSM, so every recognizer with the same
+matrix shares them, no matter which organism it belongs to.
+"""
+
+from collections import OrderedDict
+import threading
+import numpy as np
+
+# Approximate memory used by the key and bookkeeping of every entry
+ENTRY_OVERHEAD_BYTES = 200
+BYTES_PER_MB = 1024 * 1024
+
+
+class ScoreCache:
+    """LRU cache of window scores with a memory cap
+    """
+
+    def __init__(self, max_bytes: int = 0) -> None:
+        """ScoreCache constructor
+
+        Args:
+            max_bytes: memory cap of the cached scores. 0 disables the cache
+        """
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Entries and counters are shared by the threads of the process
+        self.lock = threading.RLock()
+
+    def set_max_bytes(self, max_bytes: int) -> None:
+        """Setter max_bytes. Entries are evicted if the new cap is lower
+
+        Args:
+            max_bytes: memory cap of the cached scores. 0 disables the cache
+        """
+        with self.lock:
+            self.max_bytes = max_bytes
+            self.evict()
+
+    def is_enabled(self) -> bool:
+        """Checks if scores are being cached
+
+        Returns:
+            True if the cache has memory to store scores. False otherwise
+        """
+        return self.max_bytes > 0
+
+    def get(self, key: tuple) -> np.ndarray:
+        """Returns the scores stored with a key and marks them as recently
+        used
+
+        Args:
+            key: (content hash, sequence id, strand mode)
+
+        Returns:
+            read-only array of scores if the key is cached. None otherwise
+        """
+        with self.lock:
+            scores = self.entries.get(key)
+            if scores is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return scores
+
+    def put(self, key: tuple, scores: np.ndarray) -> None:
+        """Stores scores with a key, evicting the least recently used entries
+        if the memory cap is exceeded
+
+        Args:
+            key: (content hash, sequence id, strand mode)
+            scores: array of scores. It must not be a view of a larger array
+        """
+        entry_bytes = self.get_entry_bytes(scores)
+        if entry_bytes > self.max_bytes:
+            return
+        self.set_read_only(scores)
+        with self.lock:
+            if key in self.entries:
+                self.current_bytes -= self.get_entry_bytes(
+                    self.entries.pop(key)
+                )
+            self.entries[key] = scores
+            self.current_bytes += entry_bytes
+            self.evict()
+
+    def evict(self) -> None:
+        """Drops least recently used entries until the cache fits its memory
+        cap
+        """
+        with self.lock:
+            while self.entries and self.current_bytes > self.max_bytes:
+                _, scores = self.entries.popitem(last=False)
+                self.current_bytes -= self.get_entry_bytes(scores)
+                self.evictions += 1
+
+    def get_entry_bytes(self, scores: np.ndarray) -> int:
+        """Memory counted against the cap for an entry
+
+        Args:
+            scores: cached array of scores
+
+        Returns:
+            bytes of the scores plus the bookkeeping of the entry
+        """
+        return scores.nbytes + ENTRY_OVERHEAD_BYTES
+
+    def set_read_only(self, scores: np.ndarray) -> None:
+        """Protects a cached entry, since every hit shares it
+
+        Args:
+            scores: array of scores stored in the cache
+        """
+        scores.flags.writeable = False
+
+    def clear(self) -> None:
+        """Removes all the entries
+        """
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+
+    def get_stats(self) -> dict:
+        """Counters of the cache since the last reset
+
+        Returns:
+            dictionary with the keys:
+            "hits": lookups that found their scores
+            "misses": lookups that had to scan the sequence
+            "hit_rate": fraction of lookups that were hits
+            "evictions": entries dropped to respect the memory cap
+            "entries": number of cached score arrays
+            "size_mb": memory used by the cache in MB
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "size_mb": self.current_bytes / BYTES_PER_MB,
+        }
+
+    def take_stats(self) -> dict:
+        """Counters of the cache since the last reset, resetting them in the
+        same step so no lookup of another thread is lost
+
+        Returns:
+            dictionary with the keys of get_stats
+        """
+        with self.lock:
+            stats = self.get_stats()
+            self.reset_stats()
+        return stats
+
+    def reset_stats(self) -> None:
+        """Resets hit, miss and eviction counters
+        """
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+# Cache shared by all the recognizers of the process
+SCORE_CACHE = ScoreCache()
@@ -6,14 +6,24 @@ This program searches for models that fit an specific motif.
 
 import time
 import random
-import copy
 import json
 import os
 import cProfile
 import pstats
 import io
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 import numpy as np
 from objects.organism_factory import OrganismFactory
+from objects.encoded_dataset import EncodedDataset, SharedDataset
+from objects.score_cache import SCORE_CACHE, BYTES_PER_MB
+from objects.placement_cache import PLACEMENT_CACHE
+from objects.executors import get_executor
+from objects.fitness_evaluator import (
+    set_up_worker, evaluate_organism, evaluate_organisms, race_organisms,
+    take_cache_stats,
+)
+from objects.island_channel import IslandChannel
 from Bio import SeqIO
 
 """
@@ -34,6 +44,21 @@ MIN_ITERATIONS = 0
 MIN_FITNESS = 0
 RECOMBINATION_PROBABILITY = 0.0
 THRESHOLD = 0.0
+EXECUTOR = "serial"
+EXECUTOR_WORKERS = 0
+ISLANDS = 1
+MIGRATION_INTERVAL = 0
+MIGRATION_SIZE = 0
+MIGRATION_TOPOLOGY = ""
+EVOLUTION_MODE = ""
+REPORT_INTERVAL = 0
+RACING = False
+RACE_CONFIDENCE = 0.0
+RACE_BATCH_SIZE = 0
+RACE_MIN_SEQUENCES = 0
+# Pairs of parents queued per worker in steady state mode, so workers do not
+# wait for the main process to cross the next pair
+PENDING_PAIRS_PER_WORKER = 2
 
 JSON_CONFIG_FILENAME = "config.json"
 """
@@ -57,22 +82,163 @@ mean_nodes: float = 0
 mean_fitness: float = 0
 
 # Initialize datasets
-positive_dataset: list = []
-negative_dataset: list = []
+positive_dataset: EncodedDataset = EncodedDataset([])
+negative_dataset: EncodedDataset = EncodedDataset([])
 
 
-def main():
+def main(
+        positive_dataset: EncodedDataset = None,
+        negative_dataset: EncodedDataset = None,
+) -> float:
     """Main function for the motif seek
+
+    Args:
+        positive_dataset: sequences with the motif. Read from
+                          POSITIVE_FILENAME if not given
+        negative_dataset: sequences without the motif. Read from
+                          NEGATIVE_FILENAME if not given
+
+    Returns:
+        effective fitness of the best organism of the run
     """
 
     print("Loading parameters...")
-    positive_dataset = read_fasta_file(
-        DATASET_BASE_PATH_DIR + POSITIVE_FILENAME
-    )
-    negative_dataset = read_fasta_file(
-        DATASET_BASE_PATH_DIR + NEGATIVE_FILENAME
-    )
+    if positive_dataset is None:
+        positive_dataset = read_fasta_file(
+            DATASET_BASE_PATH_DIR + POSITIVE_FILENAME
+        )
+    if negative_dataset is None:
+        negative_dataset = read_fasta_file(
+            DATASET_BASE_PATH_DIR + NEGATIVE_FILENAME
+        )
+
+    # Worker processes map the datasets instead of getting copies of them
+    a_shared = []
+    if EXECUTOR == "process" or ISLANDS > 1:
+        if positive_dataset.shared_descriptor is None:
+            a_shared.append(SharedDataset(positive_dataset))
+            positive_dataset = a_shared[-1].get_dataset()
+        if negative_dataset.shared_descriptor is None:
+            a_shared.append(SharedDataset(negative_dataset))
+            negative_dataset = a_shared[-1].get_dataset()
+
+    try:
+        if ISLANDS > 1:
+            a_results = run_islands(positive_dataset, negative_dataset)
+        else:
+            a_results = [run_island(positive_dataset, negative_dataset, None)]
+    finally:
+        for shared in a_shared:
+            shared.unlink()
+    return max(result["best_fitness"] for result in a_results)
+
 
+def run_islands(
+        positive_dataset: EncodedDataset, negative_dataset: EncodedDataset
+) -> list:
+    """Runs a population per island, every island in its own process. The
+    best organisms of every island migrate periodically to its neighbours
+
+    Args:
+        positive_dataset: sequences with the motif
+        negative_dataset: sequences without the motif
+
+    Returns:
+        summary of every island, see run_island
+    """
+    # Every island has its own random stream. Streams are drawn from the
+    # main one, so a seeded run is reproducible
+    seeds = [random.getrandbits(64) for _ in range(ISLANDS)]
+
+    manager = multiprocessing.Manager()
+    inboxes = [manager.Queue() for _ in range(ISLANDS)]
+    # Islands are forked, so they inherit the configuration read by set_up
+    with ProcessPoolExecutor(
+            max_workers=ISLANDS, mp_context=multiprocessing.get_context("fork")
+    ) as pool:
+        futures = [
+            pool.submit(
+                run_island_process,
+                island,
+                seeds[island],
+                inboxes,
+                positive_dataset,
+                negative_dataset,
+            )
+            for island in range(ISLANDS)
+        ]
+        a_results = [future.result() for future in futures]
+    manager.shutdown()
+
+    for island, result in enumerate(a_results):
+        print_ln(
+            "Island: {} BO: {} BF: {:.2f} Iterations: {}".format(
+                island,
+                result["best_id"],
+                result["best_fitness"],
+                result["iterations"],
+            ),
+            RESULT_BASE_PATH_DIR + OUTPUT_FILENAME,
+        )
+    return a_results
+
+
+# pylint: disable=R0913
+def run_island_process(
+        island: int,
+        seed: int,
+        inboxes: list,
+        positive_dataset: EncodedDataset,
+        negative_dataset: EncodedDataset,
+) -> dict:
+    """Runs the population of an island in a worker process. Results of the
+    island are written to its own directory
+
+    Args:
+        island: number of the island
+        seed: seed of the random stream of the island
+        inboxes: migration queue of every island
+        positive_dataset: sequences with the motif
+        negative_dataset: sequences without the motif
+
+    Returns:
+        summary of the island, see run_island
+    """
+    global RESULT_BASE_PATH_DIR
+
+    random.seed(seed)
+    RESULT_BASE_PATH_DIR = "{}island{}/".format(RESULT_BASE_PATH_DIR, island)
+    os.mkdir(RESULT_BASE_PATH_DIR)
+
+    channel = IslandChannel(island, inboxes, MIGRATION_TOPOLOGY)
+    try:
+        return run_island(positive_dataset, negative_dataset, channel)
+    finally:
+        # Neighbours stop waiting for this island, even if it failed
+        channel.close()
+
+
+# pylint: enable=R0913
+def run_island(
+        positive_dataset: EncodedDataset,
+        negative_dataset: EncodedDataset,
+        channel: IslandChannel,
+) -> dict:
+    """Evolves a population until the end condition is met
+
+    Args:
+        positive_dataset: sequences with the motif
+        negative_dataset: sequences without the motif
+        channel: migration channel of the island. None runs a single
+                 population without migration
+
+    Returns:
+        dictionary with the keys:
+            "best_id": ID of the best organism. None if no organism
+                       improved the initial best fitness
+            "best_fitness": effective fitness of the best organism
+            "iterations": number of iterations run
+    """
     mean_nodes = 0
     mean_fitness = 0
     """
@@ -114,9 +280,9 @@ def main():
             # FILL WITH SAME ORGANISMS IN FILE
 
             for i in range(remaining_organisms):
-                new_organism = copy.deepcopy(
-                    file_organisms[i % len(file_organisms)]
-                )
+                new_organism = file_organisms[
+                    i % len(file_organisms)
+                ].clone()
                 fill_organism_population.append(new_organism)
                 new_organism.set_id(organism_factory.get_id())
 
@@ -144,10 +310,41 @@ def main():
     last_max_score = 0.0
     best_organism = (None, 0.0, 0, 0.0)
     max_organism = (None, 0.0, 0, 0.0)
+    # Last cache entries and size reported by every process
+    d_cache_sizes: dict = {}
 
     timeformat = "%Y-%m-%d--%H-%M-%S"
+
+    # Workers are started once and keep the datasets resident for the whole
+    # run
+    executor = get_executor(
+        EXECUTOR,
+        EXECUTOR_WORKERS,
+        set_up_worker,
+        (
+            [positive_dataset, negative_dataset],
+            SCORE_CACHE.max_bytes,
+            PLACEMENT_CACHE.max_bytes,
+        ),
+    )
     print("Starting execution...")
 
+    if EVOLUTION_MODE == "steady_state":
+        result = run_steady_state(
+            organism_population,
+            organism_factory,
+            executor,
+            positive_dataset,
+            negative_dataset,
+            channel,
+        )
+        executor.shutdown()
+        return result
+    if EVOLUTION_MODE != "generational":
+        raise ValueError(
+            "Not a valid evolution mode, check the configuration file."
+        )
+
     # Main loop, it iterates until organisms do not get a significant change
     # or MIN_ITERATIONS or MIN_FITNESS is reached.
 
@@ -162,6 +359,11 @@ def main():
         random.shuffle(negative_dataset)
         random.shuffle(positive_dataset)
 
+        # Subsamples are taken once per generation, so their padded codes
+        # are packed only once for all the batch evaluations
+        positive_subsample = positive_dataset[:MAX_SEQUENCES_TO_FIT_POS]
+        negative_subsample = negative_dataset[:MAX_SEQUENCES_TO_FIT_NEG]
+
         # Reset max_score
         last_max_score = max_score
         max_score = float("-inf")
@@ -170,75 +372,86 @@ def main():
 
         a_fitness = []
         a_nodes = []
+        clone_time = 0.0
 
         # Deterministic crowding
+        # Crossover and mutation draw from the random stream, so they run
+        # here in pair order and the run stays reproducible for every
+        # executor. Only the fitness evaluations are sent to the executor
+        a_pair_children = []
         # Iterate over pairs of organisms
         for i in range(0, len(organism_population) - 1, 2):
-            org1 = organism_population[i]
-            org2 = organism_population[i + 1]
-
-            # Cross parents to get children
-            # Returns two children. Each child contains:
-            #   - Child object itself
-            #   - Similarity to organism 1
-            #   - Similarity to organism 2
-            #
-            children = combine_organisms(org1, org2, organism_factory)
-
-            child1 = children["child1"]["child"]
-            child2 = children["child2"]["child"]
-
-            # Mutate children
-            child1.mutate(organism_factory)
-            child2.mutate(organism_factory)
-
-            # Match parent with its closest child for deterministic crowding
-            # selection.
-            # There are 2 possible combinations p_1-c1, p_2-c2 & p1-c2, p2-c1
-            # We select a combination based on a sum of similarities in
-            # combinations
-            combination_1 = (
-                children["child1"]["sim_org_1"]
-                + children["child2"]["sim_org_2"]
-            )  # Match the first parent to first child and second parent to
-            # second child
-            combination_2 = (
-                children["child1"]["sim_org_2"]
-                + children["child2"]["sim_org_1"]
-            )  # Match the first parent to second child and second parent to
-            # first child
-
-            pair_children = []
-
-            if combination_1 > combination_2:
-                pair_children.append((org1, child1))
-                pair_children.append((org2, child2))
-            else:
-                pair_children.append((org1, child2))
-                pair_children.append((org2, child1))
+            variation = get_pair_children(
+                organism_population[i],
+                organism_population[i + 1],
+                organism_factory,
+            )
+            clone_time += variation["clone_time"]
+            a_pair_children.append(variation["pair_children"])
+
+        # Compute fitness for organisms, parent and child of every pair
+        positive_ids = tuple(s_dna.seq_id for s_dna in positive_subsample)
+        negative_ids = tuple(s_dna.seq_id for s_dna in negative_subsample)
+        a_races = []
+        if RACING:
+            # Parent and child race on the subsamples. Complexity does not
+            # depend on the sequences, so it is known before the race
+            a_races = executor.map(
+                race_organisms,
+                [
+                    {
+                        "organisms": pair,
+                        "positive_ids": positive_ids,
+                        "negative_ids": negative_ids,
+                        "offset": COMPLEXITY_FACTOR * (
+                            pair[1].get_complexity(mean_nodes, mean_fitness)
+                            - pair[0].get_complexity(mean_nodes, mean_fitness)
+                        ),
+                        "confidence": RACE_CONFIDENCE,
+                        "batch_size": RACE_BATCH_SIZE,
+                        "min_sequences": RACE_MIN_SEQUENCES,
+                    }
+                    for pair_children in a_pair_children
+                    for pair in pair_children
+                ],
+            )
+            a_results = [
+                result for race in a_races for result in race["results"]
+            ]
+        else:
+            a_results = executor.map(
+                evaluate_organism,
+                [
+                    {
+                        "organism": organism,
+                        "positive_ids": positive_ids,
+                        "negative_ids": negative_ids,
+                    }
+                    for pair_children in a_pair_children
+                    for pair in pair_children
+                    for organism in pair
+                ],
+            )
+
+        for i in range(0, len(organism_population) - 1, 2):
+            pair_children = a_pair_children[i // 2]
 
             # Make two organisms compete
             # j index is used to re insert winning organism
             # into the population
             for j in range(len(pair_children)):
 
-                first_organism = pair_children[j][0]  # Parent Organism
-                second_organism = pair_children[j][1]  # Chid Organism
-
-                # Compute fitness for organisms
-                p_1 = first_organism.get_seq_set_fitness(
-                    positive_dataset[:MAX_SEQUENCES_TO_FIT_POS]
-                )
-                n_1 = first_organism.get_seq_set_fitness(
-                    negative_dataset[:MAX_SEQUENCES_TO_FIT_NEG]
-                )
-
-                p_2 = second_organism.get_seq_set_fitness(
-                    positive_dataset[:MAX_SEQUENCES_TO_FIT_POS]
-                )
-                n_2 = second_organism.get_seq_set_fitness(
-                    negative_dataset[:MAX_SEQUENCES_TO_FIT_NEG]
-                )
+                # Results of the pair are the parent followed by the child.
+                # Process workers return copies of the organisms
+                result_1 = a_results[2 * (i + j)]
+                result_2 = a_results[2 * (i + j) + 1]
+                first_organism = result_1["organism"]  # Parent Organism
+                second_organism = result_2["organism"]  # Chid Organism
+
+                p_1 = result_1["positive_fitness"]
+                n_1 = result_1["negative_fitness"]
+                p_2 = result_2["positive_fitness"]
+                n_2 = result_2["negative_fitness"]
                 # Compute complexity after gettig the score
                 c_1 = first_organism.get_complexity(mean_nodes, mean_fitness)
                 c_2 = second_organism.get_complexity(mean_nodes, mean_fitness)
@@ -250,6 +463,12 @@ def main():
                 fitness2 = p_2 - n_2
                 effective_fitness_2 = fitness2 - COMPLEXITY_FACTOR * c_2
 
+                is_first_winner = effective_fitness_1 > effective_fitness_2
+                if RACING and a_races[i + j]["decided"]:
+                    # The fitness of the loser of a decided race is an
+                    # estimate, so the race tells the winner
+                    is_first_winner = a_races[i + j]["is_first_winner"]
+
                 # print(
                 #    (
                 #        "ID1: {} EFitness1:{:.2f}-{:.2f}-{:.2f} =  {:.2f}"
@@ -269,9 +488,7 @@ def main():
                 #    )
                 # )
 
-                if (
-                        effective_fitness_1 > effective_fitness_2
-                ):  # The first organism wins
+                if is_first_winner:  # The first organism wins
                     # Set it back to the population and save fitness
                     # for next iteration
                     organism_population[i + j] = first_organism
@@ -363,7 +580,7 @@ def main():
             (
                 "Iter: {} AN:{:.2f} AF:{:.2f} - MO: {} MF: {:.2f} MN: {} "
                 + "MP: {:.2f} MSP: {:.2f} -  BO: {} BF: {:.2f} BN: {} "
-                + "BP: {:.2f} Time: {}"
+                + "BP: {:.2f} Time: {} Clone time: {:.3f}s"
             ).format(
                 iterations,
                 mean_nodes,
@@ -378,9 +595,67 @@ def main():
                 best_organism[2],
                 best_organism[3],
                 s_time,
+                clone_time,
             ),
             RESULT_BASE_PATH_DIR + OUTPUT_FILENAME,
         )
+        # Process workers keep their own caches, so the counters of every
+        # task are added up
+        d_cache_stats = add_cache_stats(
+            [
+                task["cache_stats"]
+                for task in (a_races if RACING else a_results)
+            ],
+            d_cache_sizes,
+        )
+        if SCORE_CACHE.is_enabled():
+            cache_stats = d_cache_stats["score"]
+            print_ln(
+                (
+                    "Score cache: hits {} misses {} hit rate {:.2f} "
+                    + "evictions {} entries {} size {:.2f}MB"
+                ).format(
+                    cache_stats["hits"],
+                    cache_stats["misses"],
+                    cache_stats["hit_rate"],
+                    cache_stats["evictions"],
+                    cache_stats["entries"],
+                    cache_stats["size_mb"],
+                ),
+                RESULT_BASE_PATH_DIR + OUTPUT_FILENAME,
+            )
+        if PLACEMENT_CACHE.is_enabled():
+            cache_stats = d_cache_stats["placement"]
+            print_ln(
+                (
+                    "Placement cache: hits {} misses {} hit rate {:.2f} "
+                    + "evictions {} entries {} size {:.2f}MB"
+                ).format(
+                    cache_stats["hits"],
+                    cache_stats["misses"],
+                    cache_stats["hit_rate"],
+                    cache_stats["evictions"],
+                    cache_stats["entries"],
+                    cache_stats["size_mb"],
+                ),
+                RESULT_BASE_PATH_DIR + OUTPUT_FILENAME,
+            )
+        if RACING:
+            race_evaluations = sum(race["evaluations"] for race in a_races)
+            race_saved = sum(race["saved"] for race in a_races)
+            print_ln(
+                (
+                    "Racing: pairs {} decided early {} sequence evaluations "
+                    + "{} saved {} ({:.2f}%)"
+                ).format(
+                    len(a_races),
+                    sum(race["decided"] for race in a_races),
+                    race_evaluations,
+                    race_saved,
+                    100 * race_saved / max(race_evaluations + race_saved, 1),
+                ),
+                RESULT_BASE_PATH_DIR + OUTPUT_FILENAME,
+            )
 
         # Print against a random positive secuence
         random.shuffle(positive_dataset)
@@ -403,14 +678,458 @@ def main():
                 max_organism[0], positive_dataset, filename, organism_factory
             )
 
+        # Exchange organisms with the neighbour islands
+        if (
+                channel is not None
+                and (iterations + 1) % MIGRATION_INTERVAL == 0
+        ):
+            migrate_organisms(
+                organism_population, a_fitness, channel, organism_factory
+            )
+
         # print("-"*10)
         iterations += 1
         # END WHILE
 
+    executor.shutdown()
+
     # TODO: Maybe a good idea to export the full population after all
     # organism_factory.export_organisms(organism_population,
     #         RESULT_BASE_PATH_DIR+"final_population.json")
 
+    return {
+        "best_id": None if best_organism[0] is None else best_organism[0]._id,
+        "best_fitness": best_organism[1],
+        "iterations": iterations,
+    }
+
+
+# pylint: disable=R0913,R0914,R0915
+def run_steady_state(
+        organism_population: list,
+        organism_factory: OrganismFactory,
+        executor,
+        positive_dataset: EncodedDataset,
+        negative_dataset: EncodedDataset,
+        channel: IslandChannel,
+) -> dict:
+    """Evolves a population without generation barriers. New pairs of
+    parents are crossed while earlier ones are evaluated, and every result
+    updates the population, the running means and the best organism as soon
+    as it arrives. An iteration is the evaluation of as many pairs as a
+    generation has
+
+    Args:
+        organism_population: initial population, updated in place
+        organism_factory: factory that gives IDs to the children
+        executor: executor that evaluates the pairs
+        positive_dataset: sequences with the motif
+        negative_dataset: sequences without the motif
+        channel: migration channel of the island. None runs without
+                 migration
+
+    Returns:
+        summary of the run, see run_island
+    """
+    timeformat = "%Y-%m-%d--%H-%M-%S"
+    pairs_per_iteration = max(len(organism_population) // 2, 1)
+    max_pending = min(
+        PENDING_PAIRS_PER_WORKER * executor.num_workers, pairs_per_iteration
+    )
+
+    # Fitness and nodes of every organism of the population. Organisms not
+    # evaluated yet do not count in the mean fitness
+    a_fitness = [float("-inf")] * len(organism_population)
+    a_nodes = [organism.count_nodes() for organism in organism_population]
+    fitness_sum = 0.0
+    evaluated = 0
+    nodes_sum = sum(a_nodes)
+    mean_fitness = 0.0
+    mean_nodes = nodes_sum / len(a_nodes)
+
+    iterations = 0
+    evaluations = 0
+    submitted = 0
+    max_score = float("-inf")
+    max_score_p = 0.0
+    last_max_score = 0.0
+    best_organism = (None, 0.0, 0, 0.0)
+    max_organism = (None, 0.0, 0, 0.0)
+    changed_best_score = False
+    is_migration_due = False
+    finished = is_finished(
+        END_WHILE_METHOD, iterations, max_score, last_max_score
+    )
+    initial = time.time()
+
+    # Positions of the population that are not being evaluated
+    idle = list(range(len(organism_population)))
+    # Positions of the parents of every submitted pair, in submission order
+    pending = {}
+
+    while True:
+        # Cross new pairs while there is room in the queue
+        while not finished and not is_migration_due and (
+                len(pending) < max_pending
+        ):
+            if submitted % pairs_per_iteration == 0:
+                # Datasets are shuffled for subsampling once per iteration
+                random.shuffle(negative_dataset)
+                random.shuffle(positive_dataset)
+                positive_ids = tuple(
+                    s_dna.seq_id
+                    for s_dna in positive_dataset[:MAX_SEQUENCES_TO_FIT_POS]
+                )
+                negative_ids = tuple(
+                    s_dna.seq_id
+                    for s_dna in negative_dataset[:MAX_SEQUENCES_TO_FIT_NEG]
+                )
+
+            indices = random.sample(idle, 2)
+            for index in indices:
+                idle.remove(index)
+            variation = get_pair_children(
+                organism_population[indices[0]],
+                organism_population[indices[1]],
+                organism_factory,
+            )
+            future = executor.submit(
+                evaluate_organisms,
+                {
+                    "organisms": [
+                        organism
+                        for pair in variation["pair_children"]
+                        for organism in pair
+                    ],
+                    "positive_ids": positive_ids,
+                    "negative_ids": negative_ids,
+                },
+            )
+            pending[future] = indices
+            submitted += 1
+
+        if not pending:
+            if not is_migration_due:
+                break
+            # Exchange organisms with the neighbour islands. Immigrants are
+            # not evaluated until they are picked as parents
+            a_previous = list(organism_population)
+            migrate_organisms(
+                organism_population, a_fitness, channel, organism_factory
+            )
+            for index, organism in enumerate(organism_population):
+                if organism is not a_previous[index]:
+                    if a_fitness[index] > float("-inf"):
+                        fitness_sum -= a_fitness[index]
+                        evaluated -= 1
+                    a_fitness[index] = float("-inf")
+                    nodes_sum += organism.count_nodes() - a_nodes[index]
+                    a_nodes[index] = organism.count_nodes()
+            mean_nodes = nodes_sum / len(a_nodes)
+            is_migration_due = False
+            continue
+
+        # Results are handled in submission order, so serial runs are
+        # reproducible
+        done, _ = wait(pending.keys(), return_when=FIRST_COMPLETED)
+        for future in [future for future in pending if future in done]:
+            indices = pending.pop(future)
+            a_results = future.result()
+
+            # Make every parent compete with its child
+            for j, index in enumerate(indices):
+                result_1 = a_results[2 * j]
+                result_2 = a_results[2 * j + 1]
+                first_organism = result_1["organism"]  # Parent Organism
+                second_organism = result_2["organism"]  # Chid Organism
+
+                fitness1 = (
+                    result_1["positive_fitness"]
+                    - result_1["negative_fitness"]
+                )
+                c_1 = first_organism.get_complexity(mean_nodes, mean_fitness)
+                effective_fitness_1 = fitness1 - COMPLEXITY_FACTOR * c_1
+
+                fitness2 = (
+                    result_2["positive_fitness"]
+                    - result_2["negative_fitness"]
+                )
+                c_2 = second_organism.get_complexity(mean_nodes, mean_fitness)
+                effective_fitness_2 = fitness2 - COMPLEXITY_FACTOR * c_2
+
+                if effective_fitness_1 > effective_fitness_2:
+                    winner = (
+                        first_organism,
+                        effective_fitness_1,
+                        first_organism.count_nodes(),
+                        c_1,
+                    )
+                    fitness = fitness1
+                    positive_fitness = result_1["positive_fitness"]
+                else:
+                    winner = (
+                        second_organism,
+                        effective_fitness_2,
+                        second_organism.count_nodes(),
+                        c_2,
+                    )
+                    fitness = fitness2
+                    positive_fitness = result_2["positive_fitness"]
+
+                    # Pass tracking parameter from parent to child
+                    second_organism.set_is_tracked(first_organism.is_tracked)
+                    if second_organism.is_tracked:
+                        # Export it If its being tracked
+                        print_ln(
+                            "Evolution {}->{}".format(
+                                first_organism._id, second_organism._id
+                            ),
+                            RESULT_BASE_PATH_DIR + "evolution.txt",
+                        )
+                        filename = "tr{}_{}".format(
+                            time.strftime(timeformat), second_organism._id
+                        )
+                        export_organism(
+                            second_organism,
+                            positive_dataset,
+                            filename,
+                            organism_factory,
+                        )
+
+                # Update the population and the running means
+                organism_population[index] = winner[0]
+                if a_fitness[index] > float("-inf"):
+                    fitness_sum -= a_fitness[index]
+                else:
+                    evaluated += 1
+                a_fitness[index] = fitness
+                fitness_sum += fitness
+                nodes_sum += winner[2] - a_nodes[index]
+                a_nodes[index] = winner[2]
+                mean_fitness = fitness_sum / evaluated
+                mean_nodes = nodes_sum / len(a_nodes)
+
+                # Check if its the max score in that iteration
+                if winner[1] > max_score:
+                    max_score = winner[1]
+                    max_score_p = positive_fitness
+                    max_organism = winner
+                # Check if its the max score so far
+                if winner[1] > best_organism[1]:
+                    best_organism = winner
+                    changed_best_score = True
+
+            idle += indices
+            evaluations += 1
+
+            if evaluations % REPORT_INTERVAL == 0:
+                _m, _s = divmod((time.time() - initial), 60)
+                _h, _m = divmod(_m, 60)
+                s_time = "{}h:{}m:{:.2f}s".format(int(_h), int(_m), _s)
+                print_ln(
+                    (
+                        "Evaluations: {} Iter: {} AN:{:.2f} AF:{:.2f} - "
+                        + "MO: {} MF: {:.2f} MN: {} MP: {:.2f} MSP: {:.2f} - "
+                        + " BO: {} BF: {:.2f} BN: {} BP: {:.2f} Time: {}"
+                    ).format(
+                        evaluations,
+                        iterations,
+                        mean_nodes,
+                        mean_fitness,
+                        max_organism[0]._id,
+                        max_organism[1],
+                        max_organism[2],
+                        max_organism[3],
+                        max_score_p,
+                        # No best organism until one beats the initial 0.0
+                        None
+                        if best_organism[0] is None
+                        else best_organism[0]._id,
+                        best_organism[1],
+                        best_organism[2],
+                        best_organism[3],
+                        s_time,
+                    ),
+                    RESULT_BASE_PATH_DIR + OUTPUT_FILENAME,
+                )
+                initial = time.time()
+
+            if evaluations % pairs_per_iteration == 0:
+                # Export organism if new best organism
+                if changed_best_score:
+                    filename = "{}_{}".format(
+                        time.strftime(timeformat), best_organism[0]._id
+                    )
+                    export_organism(
+                        best_organism[0],
+                        positive_dataset,
+                        filename,
+                        organism_factory,
+                    )
+                    changed_best_score = False
+                # Periodic organism export
+                if iterations % PERIODIC_EXPORT == 0:
+                    filename = "{}_{}".format(
+                        time.strftime(timeformat), max_organism[0]._id
+                    )
+                    export_organism(
+                        max_organism[0],
+                        positive_dataset,
+                        filename,
+                        organism_factory,
+                    )
+
+                iterations += 1
+                finished = is_finished(
+                    END_WHILE_METHOD, iterations, max_score, last_max_score
+                )
+                last_max_score = max_score
+                max_score = float("-inf")
+                if (
+                        channel is not None
+                        and iterations % MIGRATION_INTERVAL == 0
+                ):
+                    is_migration_due = True
+
+    return {
+        "best_id": None if best_organism[0] is None else best_organism[0]._id,
+        "best_fitness": best_organism[1],
+        "iterations": iterations,
+    }
+
+
+# pylint: enable=R0913,R0914,R0915
+def migrate_organisms(
+        organism_population: list,
+        a_fitness: list,
+        channel: IslandChannel,
+        organism_factory: OrganismFactory,
+) -> None:
+    """Sends the best organisms of the island to its neighbours and puts the
+    immigrants in place of the worst ones
+
+    Args:
+        organism_population: population of the island, updated in place
+        a_fitness: fitness of every organism of the population in the last
+                   iteration
+        channel: migration channel of the island
+        organism_factory: factory that exports and imports the organisms
+    """
+    # Organisms are ranked by the fitness of the last iteration
+    ranking = sorted(
+        range(len(a_fitness)), key=lambda index: a_fitness[index],
+        reverse=True
+    )
+    channel.send(
+        [
+            organism_factory.export_organism(organism_population[index])
+            for index in ranking[:MIGRATION_SIZE]
+        ]
+    )
+    a_migrants = channel.receive()
+
+    # Immigrants never replace the emigrants
+    a_worst = ranking[MIGRATION_SIZE:][::-1][:len(a_migrants)]
+    for index, migrant in zip(a_worst, a_migrants):
+        organism_population[index] = organism_factory.import_organism(migrant)
+
+
+def add_cache_stats(a_cache_stats: list, d_cache_sizes: dict) -> dict:
+    """Adds up the cache counters taken by the tasks of an iteration and by
+    the main process. Serial and thread tasks take the counters of the main
+    process, so no lookup is counted twice
+
+    Args:
+        a_cache_stats: take_cache_stats of every task
+        d_cache_sizes: last cache stats of every process, by process id and
+                       cache. It is updated with the new stats
+
+    Returns:
+        dictionary with the keys "score" and "placement", with the hits,
+        misses and evictions of all the tasks, and the entries and size of
+        the caches of all the processes, as in ScoreCache.get_stats
+    """
+    d_totals = {}
+    for cache_stats in a_cache_stats + [take_cache_stats()]:
+        for name in ["score", "placement"]:
+            stats = cache_stats[name]
+            d_cache_sizes[(cache_stats["pid"], name)] = stats
+            totals = d_totals.setdefault(
+                name, {"hits": 0, "misses": 0, "evictions": 0}
+            )
+            for key in totals:
+                totals[key] += stats[key]
+
+    for name, totals in d_totals.items():
+        lookups = totals["hits"] + totals["misses"]
+        totals["hit_rate"] = totals["hits"] / lookups if lookups else 0.0
+        for key in ["entries", "size_mb"]:
+            totals[key] = sum(
+                stats[key]
+                for (_, cache_name), stats in d_cache_sizes.items()
+                if cache_name == name
+            )
+    return d_totals
+
+
+def get_pair_children(org1, org2, organism_factory: OrganismFactory) -> dict:
+    """Crosses and mutates two parents, and matches every parent with its
+    closest child for deterministic crowding selection
+
+    Args:
+        org1 (OrganismObject): first parent
+        org2 (OrganismObject): second parent
+        organism_factory: factory that gives IDs to the children
+
+    Returns:
+        dictionary with the keys:
+            "pair_children": list with the (parent, child) pair of org1
+                             followed by the one of org2
+            "clone_time": seconds spent cloning the parents
+    """
+    # Cross parents to get children
+    # Returns two children. Each child contains:
+    #   - Child object itself
+    #   - Similarity to organism 1
+    #   - Similarity to organism 2
+    #
+    children = combine_organisms(org1, org2, organism_factory)
+
+    child1 = children["child1"]["child"]
+    child2 = children["child2"]["child"]
+
+    # Mutate children
+    child1.mutate(organism_factory)
+    child2.mutate(organism_factory)
+
+    # Match parent with its closest child for deterministic crowding
+    # selection.
+    # There are 2 possible combinations p_1-c1, p_2-c2 & p1-c2, p2-c1
+    # We select a combination based on a sum of similarities in
+    # combinations
+    combination_1 = (
+        children["child1"]["sim_org_1"] + children["child2"]["sim_org_2"]
+    )  # Match the first parent to first child and second parent to
+    # second child
+    combination_2 = (
+        children["child1"]["sim_org_2"] + children["child2"]["sim_org_1"]
+    )  # Match the first parent to second child and second parent to
+    # first child
+
+    pair_children = []
+
+    if combination_1 > combination_2:
+        pair_children.append((org1, child1))
+        pair_children.append((org2, child2))
+    else:
+        pair_children.append((org1, child2))
+        pair_children.append((org2, child1))
+
+    return {
+        "pair_children": pair_children,
+        "clone_time": children["clone_time"],
+    }
+
 
 def is_finished(
         method: str, iterations: int, max_score: float, last_max_score: float
@@ -442,7 +1161,10 @@ def is_finished(
 
 
 def export_organism(
-        organism, dataset: list, filename: str, factory: OrganismFactory
+        organism,
+        dataset: EncodedDataset,
+        filename: str,
+        factory: OrganismFactory,
 ) -> None:
     """Exports a single organism in json format, visual format and its
     recognizers binding
@@ -480,14 +1202,17 @@ def combine_organisms(
         A dictionary with 2 children:
         "child1": child derived from organism1
         "child2": child derived from organism1
+        "clone_time": seconds spent copying the parents
     """
     # Save the number of nodes from the parents
     n_nodes_org_1 = organism1.count_nodes()
     n_nodes_org_2 = organism2.count_nodes()
 
     # Create the 2 childs and assign new IDs
-    child1 = copy.deepcopy(organism1)
-    child2 = copy.deepcopy(organism2)
+    initial = time.time()
+    child1 = organism1.clone()
+    child2 = organism2.clone()
+    clone_time = time.time() - initial
 
     # Assign IDs to organisms and increase factory counter
     child1.set_id(organism_factory.get_id())
@@ -507,8 +1232,8 @@ def combine_organisms(
         n_nodes_from_org_2 = node2.count_nodes()
 
         # Get parents nodes of swapping nodes before swap
-        parent_node_1 = child1.get_parent(node1._id)
-        parent_node_2 = child2.get_parent(node2._id)
+        parent_node_1 = child1.get_parent(node1)
+        parent_node_2 = child2.get_parent(node2)
 
         # Swap nodes
         # Set nodes in oposite children
@@ -576,12 +1301,21 @@ def combine_organisms(
             "child": child2,
         }
 
-    return {"child1": child_1_similarities, "child2": child_2_similarities}
+    return {
+        "child1": child_1_similarities,
+        "child2": child_2_similarities,
+        "clone_time": clone_time,
+    }
 
 
-def set_up():
+def set_up(overrides: dict = None, run_name: str = "") -> None:
     """Reads configuration file and sets up all program variables
 
+    Args:
+        overrides: values that replace the ones of the configuration file,
+                   by section and key
+        run_name: suffix of the results directory, so runs started in the
+                  same second get different directories
     """
 
     # specify as global variable so it can be accesed in local
@@ -606,6 +1340,18 @@ def set_up():
     global OUTPUT_FILENAME
     global RECOMBINATION_PROBABILITY
     global PERIODIC_EXPORT
+    global EXECUTOR
+    global EXECUTOR_WORKERS
+    global ISLANDS
+    global MIGRATION_INTERVAL
+    global MIGRATION_SIZE
+    global MIGRATION_TOPOLOGY
+    global EVOLUTION_MODE
+    global REPORT_INTERVAL
+    global RACING
+    global RACE_CONFIDENCE
+    global RACE_BATCH_SIZE
+    global RACE_MIN_SEQUENCES
 
     # Config data
     global configOrganism
@@ -613,13 +1359,14 @@ def set_up():
     global configConnector
     global configPssm
 
-    config = read_json_file(JSON_CONFIG_FILENAME)
+    config = read_config(overrides)
     # Store config variables for main function
     POPULATION_LENGTH = config["main"]["POPULATION_LENGTH"]
     DATASET_BASE_PATH_DIR = config["main"]["DATASET_BASE_PATH_DIR"]
     RESULT_BASE_PATH_DIR = (
         config["main"]["RESULT_BASE_PATH_DIR"]
         + time.strftime("%Y%m%d%H%M%S")
+        + run_name
         + "/"
     )
     POSITIVE_FILENAME = config["main"]["POSITIVE_FILENAME"]
@@ -637,6 +1384,33 @@ def set_up():
     OUTPUT_FILENAME = config["main"]["OUTPUT_FILENAME"]
     RECOMBINATION_PROBABILITY = config["main"]["RECOMBINATION_PROBABILITY"]
     PERIODIC_EXPORT = config["main"]["PERIODIC_EXPORT"]
+    EXECUTOR = config["main"]["EXECUTOR"]
+    EXECUTOR_WORKERS = config["main"]["EXECUTOR_WORKERS"]
+    ISLANDS = config["main"]["ISLANDS"]
+    MIGRATION_INTERVAL = config["main"]["MIGRATION_INTERVAL"]
+    MIGRATION_SIZE = config["main"]["MIGRATION_SIZE"]
+    MIGRATION_TOPOLOGY = config["main"]["MIGRATION_TOPOLOGY"]
+    EVOLUTION_MODE = config["main"]["EVOLUTION_MODE"]
+    # Steady state crosses pairs of different organisms
+    if EVOLUTION_MODE == "steady_state" and POPULATION_LENGTH < 2:
+        raise ValueError(
+            "Steady state mode needs a POPULATION_LENGTH of at least 2, "
+            + "check the configuration file."
+        )
+    REPORT_INTERVAL = config["main"]["REPORT_INTERVAL"]
+    RACING = config["main"]["RACING"]
+    RACE_CONFIDENCE = config["main"]["RACE_CONFIDENCE"]
+    RACE_BATCH_SIZE = config["main"]["RACE_BATCH_SIZE"]
+    RACE_MIN_SEQUENCES = config["main"]["RACE_MIN_SEQUENCES"]
+
+    # Memory cap of the window scores shared by all the recognizers
+    SCORE_CACHE.set_max_bytes(
+        int(config["main"]["SCORE_CACHE_MAX_MB"] * BYTES_PER_MB)
+    )
+    # Memory cap of the subtree placements shared by all the organisms
+    PLACEMENT_CACHE.set_max_bytes(
+        int(config["main"]["PLACEMENT_CACHE_MAX_MB"] * BYTES_PER_MB)
+    )
 
     # Create directory where the output and results will be stored
     os.mkdir(RESULT_BASE_PATH_DIR)
@@ -664,18 +1438,16 @@ def set_up():
     print_ln("-" * 50, parameters_path)
 
 
-def read_fasta_file(filename: str) -> list:
-    """Reads a fasta file and returns an array of DNA sequences (strings)
-
-    TODO: probably it can be useful to create our own Sequence object that
-    creates the string and stores some properties from fasta format. Also
-    we can adapt the current program to use Biopythons's Seq object.
+def read_fasta_file(filename: str) -> EncodedDataset:
+    """Reads a fasta file and returns the encoded DNA sequences. Sequences
+    are encoded once here, so organisms never work with strings when they
+    are evaluated.
 
     Args:
         filename: Name of the file that contains FASTA format sequences to read
 
     Returns:
-        The set of sequences in string format
+        The set of sequences encoded for the scan engine
 
     """
     dataset = []
@@ -685,7 +1457,24 @@ def read_fasta_file(filename: str) -> list:
     for fasta in fasta_sequences:
         dataset.append(str(fasta.seq).lower())
 
-    return dataset
+    return EncodedDataset.from_strings(dataset)
+
+
+def read_config(overrides: dict = None) -> dict:
+    """Reads the configuration file, replacing some of its values
+
+    Args:
+        overrides: values that replace the ones of the file, by section and
+                   key. For example {"main": {"POPULATION_LENGTH": 40}}
+
+    Returns:
+        Dictionary with the configuration
+    """
+    config = read_json_file(JSON_CONFIG_FILENAME)
+    if overrides is not None:
+        for section, values in overrides.items():
+            config[section].update(values)
+    return config
 
 
 def read_json_file(filename: str) -> dict:
@@ -0,0 +1,133 @@
+"""Tests the pairing of placements by the connectors
+The best pairs of a connector are compared with a search over every pair of
+candidates of its two nodes
+"""
+
+import copy
+import os
+import random
+import numpy as np
+from search_organisms import read_fasta_file, read_json_file
+from objects.organism_factory import OrganismFactory
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(SRC_DIR, "config.json")
+# Sequences of the positive dataset placed by every test
+NUM_SEQUENCES = 10
+NUM_CONNECTORS = 10
+# Candidates of every pssm in beam placement, so grids are scored whole
+PSSM_PLACEMENT_OPTIONS = 5
+SEED = 11
+
+
+def get_factory() -> OrganismFactory:
+    """Organism factory of the configuration file, with more candidates per
+    pssm
+
+    Returns:
+        OrganismFactory
+    """
+    config = read_json_file(CONFIG_FILE)
+    conf_pssm = copy.deepcopy(config["pssm"])
+    conf_pssm["PLACEMENT_OPTIONS"] = PSSM_PLACEMENT_OPTIONS
+    return OrganismFactory(
+        config["organism"],
+        config["organismFactory"],
+        config["connector"],
+        conf_pssm,
+    )
+
+
+def get_dataset():
+    """First sequences of the positive dataset
+
+    Returns:
+        EncodedDataset
+    """
+    config = read_json_file(CONFIG_FILE)
+    return read_fasta_file(
+        os.path.join(
+            SRC_DIR,
+            config["main"]["DATASET_BASE_PATH_DIR"],
+            config["main"]["POSITIVE_FILENAME"],
+        )
+    )[:NUM_SEQUENCES]
+
+
+def get_best_pair_energies(connector, placements_1, placements_2):
+    """Energies of the best non overlapping pairs, scoring every pair.
+    Overlaps are found from the positions and lengths of the pssms
+
+    Args:
+        connector (ConnectorObject): connector of both nodes
+        placements_1 (PlacementSet): candidates of node 1
+        placements_2 (PlacementSet): candidates of node 2
+
+    Returns:
+        energies of the best pairs, sorted from the highest
+    """
+    start_1 = placements_1.lock_position[:, 0][:, np.newaxis]
+    start_2 = placements_2.lock_position[:, 0][np.newaxis, :]
+    is_overlapping = (start_1 < start_2 + placements_2.lock_length[0]) & (
+        start_2 < start_1 + placements_1.lock_length[0]
+    )
+    energies = (
+        placements_1.energy[:, np.newaxis]
+        + placements_2.energy[np.newaxis, :]
+        + connector.get_connector_energies(
+            placements_1.position[:, np.newaxis],
+            placements_2.position[np.newaxis, :],
+        )
+    )
+    energies = np.sort(energies[~is_overlapping])[::-1]
+    return energies[:connector.placement_options]
+
+
+def test_combine_placements_matches_pair_search():
+    """Connectors keep the best pairs of candidates, both scoring whole
+    grids of pairs and searching large grids lazily
+    """
+    dataset = get_dataset()
+    random.seed(SEED)
+    factory = get_factory()
+    for _ in range(NUM_CONNECTORS):
+        # Connectors of two pssms
+        connector = factory.create_connection(0.0)
+        for s_dna in dataset:
+            for placements_1, placements_2 in [
+                    (
+                        connector.node1.get_placement_2(s_dna),
+                        connector.node2.get_placement_2(s_dna),
+                    ),
+                    (
+                        connector.node1.get_placement_table(s_dna),
+                        connector.node2.get_placement_table(s_dna),
+                    ),
+            ]:
+                placements = connector.combine_placements(
+                    placements_1, placements_2
+                )
+                assert np.array_equal(
+                    placements.energy,
+                    get_best_pair_energies(
+                        connector, placements_1, placements_2
+                    ),
+                )
+
+
+def test_anchor_placement_keeps_best_pair():
+    """Connectors of two pssms keep the best non overlapping pair of binding
+    sites among the best pairs of their anchor bins
+    """
+    dataset = get_dataset()
+    random.seed(SEED)
+    factory = get_factory()
+    for _ in range(NUM_CONNECTORS):
+        connector = factory.create_connection(0.0)
+        for s_dna in dataset:
+            table_1 = connector.node1.get_placement_table(s_dna)
+            table_2 = connector.node2.get_placement_table(s_dna)
+            placements = connector.combine_placement_tables(table_1, table_2)
+            assert placements.energy.max() == get_best_pair_energies(
+                connector, table_1, table_2
+            )[0]
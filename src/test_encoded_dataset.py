@@ -0,0 +1,48 @@
+"""Tests the datasets shared with other processes
+Shared datasets must be sent as their descriptor, keeping the sequences and
+order of slices and shuffles
+"""
+
+import pickle
+import random
+from objects.encoded_dataset import (
+    EncodedDataset,
+    EncodedSequence,
+    SharedDataset,
+)
+
+NUM_SEQUENCES = 10
+SEED = 1
+
+
+def test_shared_slices_keep_order_when_pickled():
+    """Shuffled slices of a shared dataset are pickled as the descriptor of
+    the block, and come back with the same sequences in the same order
+    """
+    dataset = EncodedDataset.from_strings(
+        ["acgt" * (index + 1) for index in range(NUM_SEQUENCES)]
+    )
+    shared = SharedDataset(dataset)
+    try:
+        shared_dataset = shared.get_dataset()
+        random.seed(SEED)
+        random.shuffle(shared_dataset)
+        a_slice = shared_dataset[2:7]
+        assert a_slice.shared_descriptor is not None
+
+        copied = pickle.loads(pickle.dumps(a_slice))
+        assert copied.shared_descriptor == a_slice.shared_descriptor
+        assert [s_dna.seq_id for s_dna in copied] == [
+            s_dna.seq_id for s_dna in a_slice
+        ]
+        assert copied.get_strings() == a_slice.get_strings()
+        # Sequences are views of the block, not copies
+        assert not copied[0].codes.flags.owndata
+
+        # Sequences that are not in the block are sent by value
+        shared_dataset[0] = EncodedSequence.from_string("aaaa")
+        copied = pickle.loads(pickle.dumps(shared_dataset))
+        assert copied.shared_descriptor is None
+        assert copied.get_strings() == shared_dataset.get_strings()
+    finally:
+        shared.unlink()
@@ -48,10 +48,10 @@ def main():
         # org.print()
         nodes = org.count_nodes()
 
-        p_1 = org.get_seq_set_fitness(
+        p_1 = org.get_seq_set_fitness_batch(
             positive_dataset[:max_sequences_to_fit_pos]
         )
-        n_1 = org.get_seq_set_fitness(
+        n_1 = org.get_seq_set_fitness_batch(
             negative_dataset[:max_sequences_to_fit_neg]
         )
         # p1 = 20
@@ -0,0 +1,166 @@
+"""Tests the fitness of the organisms
+Faster evaluation paths are compared with the sequence by sequence
+evaluation of the same organisms
+"""
+
+import copy
+import os
+import random
+from search_organisms import read_fasta_file, read_json_file
+from objects.organism_factory import OrganismFactory
+from objects.placement_cache import PLACEMENT_CACHE
+from objects.score_cache import SCORE_CACHE
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(SRC_DIR, "config.json")
+# Sequences of the positive dataset evaluated by every test
+NUM_SEQUENCES = 20
+NUM_ORGANISMS = 15
+# Rounds of mutation of the organisms in the tests of reused results
+GENERATIONS = 4
+# Memory cap of the caches when they are enabled by a test
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+SEED = 3
+
+
+def get_factory(organism_overrides: dict = None) -> OrganismFactory:
+    """Organism factory of the configuration file
+
+    Args:
+        organism_overrides: values that replace the ones of the organism
+                            section
+
+    Returns:
+        OrganismFactory
+    """
+    config = read_json_file(CONFIG_FILE)
+    conf_org = copy.deepcopy(config["organism"])
+    conf_org.update(organism_overrides or {})
+    return OrganismFactory(
+        conf_org,
+        config["organismFactory"],
+        config["connector"],
+        config["pssm"],
+    )
+
+
+def get_organisms(factory: OrganismFactory) -> list:
+    """Random organisms, the same ones on every call
+
+    Args:
+        factory: factory of the organisms
+
+    Returns:
+        list of OrganismObject
+    """
+    random.seed(SEED)
+    return [factory.get_organism() for _ in range(NUM_ORGANISMS)]
+
+
+def get_dataset():
+    """First sequences of the positive dataset
+
+    Returns:
+        EncodedDataset
+    """
+    config = read_json_file(CONFIG_FILE)
+    return read_fasta_file(
+        os.path.join(
+            SRC_DIR,
+            config["main"]["DATASET_BASE_PATH_DIR"],
+            config["main"]["POSITIVE_FILENAME"],
+        )
+    )[:NUM_SEQUENCES]
+
+
+def get_evolution_fitness(factory: OrganismFactory, dataset) -> list:
+    """Fitness of random organisms mutated for some generations. Children
+    share unchanged pssms and subtrees with their parents
+
+    Args:
+        factory: factory of the organisms
+        dataset: encoded DNA sequences
+
+    Returns:
+        fitness of every organism on every generation
+    """
+    a_organisms = get_organisms(factory)
+    a_fitness = []
+    for _ in range(GENERATIONS):
+        for index, organism in enumerate(a_organisms):
+            a_fitness.append(organism.get_seq_set_fitness_batch(dataset))
+            child = organism.clone()
+            child.mutate(factory)
+            a_organisms[index] = child
+    return a_fitness
+
+
+def test_batch_fitness_matches_sequence_fitness():
+    """Scoring the whole dataset at once gives the fitness of scoring the
+    sequences one by one
+    """
+    dataset = get_dataset()
+    for organism in get_organisms(get_factory()):
+        expected = organism.clone().get_seq_set_fitness(dataset)
+        assert organism.get_seq_set_fitness_batch(dataset) == expected
+
+
+def test_anchor_placement_not_worse_than_beam():
+    """Empirical check: anchor placement does not place these organisms on
+    these sequences with less energy than beam placement. Neither mode is
+    exact, so this is not guaranteed for every organism
+    """
+    dataset = get_dataset()
+    a_beam = get_organisms(get_factory({"PLACEMENT_MODE": "beam"}))
+    a_anchor = get_organisms(get_factory({"PLACEMENT_MODE": "anchor"}))
+    for beam_organism, anchor_organism in zip(a_beam, a_anchor):
+        for s_dna in dataset:
+            assert (
+                anchor_organism.get_seq_fitness(s_dna)["energy"]
+                >= beam_organism.get_seq_fitness(s_dna)["energy"]
+            )
+
+
+def test_memoized_fitness_matches_fresh_evaluation():
+    """Energies memoized by an organism are reused by its clones and dropped
+    when it mutates, so they always give the fitness of a new evaluation
+    """
+    dataset = get_dataset()
+    factory = get_factory()
+    a_organisms = get_organisms(factory)
+    for _ in range(GENERATIONS):
+        for index, organism in enumerate(a_organisms):
+            fitness = organism.get_seq_set_fitness_batch(dataset)
+            child = organism.clone()
+            assert child.get_seq_set_fitness_batch(dataset) == fitness
+            child.mutate(factory)
+
+            fresh_child = child.clone()
+            fresh_child.set_genome_changed()
+            assert child.get_seq_set_fitness_batch(
+                dataset
+            ) == fresh_child.get_seq_set_fitness(dataset)
+            a_organisms[index] = child
+
+
+def test_caches_do_not_change_fitness():
+    """Window scores and subtree placements taken from the caches give the
+    fitness of scanning and placing again
+    """
+    dataset = get_dataset()
+    for placement_mode in ["beam", "anchor"]:
+        factory = get_factory({"PLACEMENT_MODE": placement_mode})
+        expected = get_evolution_fitness(factory, dataset)
+        try:
+            SCORE_CACHE.set_max_bytes(CACHE_MAX_BYTES)
+            PLACEMENT_CACHE.set_max_bytes(CACHE_MAX_BYTES)
+            # The second run takes everything from the caches
+            for _ in range(2):
+                assert get_evolution_fitness(factory, dataset) == expected
+            assert SCORE_CACHE.get_stats()["hits"] > 0
+            assert PLACEMENT_CACHE.get_stats()["hits"] > 0
+        finally:
+            for cache in [SCORE_CACHE, PLACEMENT_CACHE]:
+                cache.set_max_bytes(0)
+                cache.clear()
+                cache.reset_stats()
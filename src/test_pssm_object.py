@@ -0,0 +1,146 @@
+"""Tests the window scores of the PSSM recognizers
+Vectorized scans are compared with scoring every window one by one
+"""
+
+import copy
+import os
+import pickle
+import random
+import numpy as np
+from search_organisms import read_fasta_file, read_json_file
+from objects.organism_factory import OrganismFactory
+from objects.pssm_object import PssmObject
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(SRC_DIR, "config.json")
+# Sequences of the negative dataset scored by every test
+NUM_SEQUENCES = 20
+PSSM_LENGTHS = [1, 4, 5, 12]
+KMER_TABLE_MAX_LENGTH = 6
+SEED = 5
+
+
+def get_factory(pssm_overrides: dict = None) -> OrganismFactory:
+    """Organism factory of the configuration file
+
+    Args:
+        pssm_overrides: values that replace the ones of the pssm section
+
+    Returns:
+        OrganismFactory
+    """
+    config = read_json_file(CONFIG_FILE)
+    conf_pssm = copy.deepcopy(config["pssm"])
+    conf_pssm.update(pssm_overrides or {})
+    return OrganismFactory(
+        config["organism"],
+        config["organismFactory"],
+        config["connector"],
+        conf_pssm,
+    )
+
+
+def get_dataset():
+    """First sequences of the negative dataset
+
+    Returns:
+        EncodedDataset
+    """
+    config = read_json_file(CONFIG_FILE)
+    return read_fasta_file(
+        os.path.join(
+            SRC_DIR,
+            config["main"]["DATASET_BASE_PATH_DIR"],
+            config["main"]["NEGATIVE_FILENAME"],
+        )
+    )[:NUM_SEQUENCES]
+
+
+def test_window_scores_match_get_score():
+    """Scanned window scores are the ones get_score gives every window
+    """
+    dataset = get_dataset()
+    for scan_reverse_complement in [False, True]:
+        random.seed(SEED)
+        factory = get_factory(
+            {
+                "SCAN_REVERSE_COMPLEMENT": scan_reverse_complement,
+                "KMER_TABLE_MAX_LENGTH": 0,
+            }
+        )
+        for length in PSSM_LENGTHS:
+            pssm = factory.create_pssm(length)
+            batch_scores = pssm.scan_batch_window_scores(dataset)
+            for row, s_dna in enumerate(dataset):
+                num_binding_sites = s_dna.length - length
+                expected = [
+                    pssm.get_score(s_dna.sequence[pos: pos + length])
+                    for pos in range(num_binding_sites)
+                ]
+                assert np.array_equal(
+                    pssm.scan_window_scores(s_dna, num_binding_sites),
+                    expected,
+                )
+                assert np.array_equal(
+                    batch_scores[row, :num_binding_sites], expected
+                )
+
+
+def test_kmer_table_matches_column_scan():
+    """Short PSSMs score and pick strands with the k-mer table as they do
+    scanning the columns
+    """
+    dataset = get_dataset()
+    for scan_reverse_complement in [False, True]:
+        random.seed(SEED)
+        factory = get_factory(
+            {
+                "SCAN_REVERSE_COMPLEMENT": scan_reverse_complement,
+                "KMER_TABLE_MAX_LENGTH": KMER_TABLE_MAX_LENGTH,
+            }
+        )
+        conf_no_table = dict(factory.conf_pssm, KMER_TABLE_MAX_LENGTH=0)
+        for length in range(1, KMER_TABLE_MAX_LENGTH + 1):
+            pssm = factory.create_pssm(length)
+            column_pssm = PssmObject(pssm.pwm, conf_no_table)
+            assert pssm.get_kmer_tables()[0] is not None
+            assert column_pssm.get_kmer_tables()[0] is None
+
+            assert np.array_equal(
+                pssm.scan_batch_window_scores(dataset),
+                column_pssm.scan_batch_window_scores(dataset),
+            )
+            for s_dna in dataset:
+                num_binding_sites = s_dna.length - length
+                positions = np.arange(num_binding_sites)
+                assert np.array_equal(
+                    pssm.scan_window_scores(s_dna, num_binding_sites),
+                    column_pssm.scan_window_scores(s_dna, num_binding_sites),
+                )
+                assert np.array_equal(
+                    pssm.get_reverse_strands(s_dna, positions),
+                    column_pssm.get_reverse_strands(s_dna, positions),
+                )
+
+
+def test_kmer_tables_are_not_pickled():
+    """Pickled PSSMs leave their k-mer tables behind and build them again
+    when they scan
+    """
+    dataset = get_dataset()
+    random.seed(SEED)
+    factory = get_factory(
+        {
+            "SCAN_REVERSE_COMPLEMENT": True,
+            "KMER_TABLE_MAX_LENGTH": KMER_TABLE_MAX_LENGTH,
+        }
+    )
+    pssm = factory.create_pssm(KMER_TABLE_MAX_LENGTH)
+    scores = pssm.scan_batch_window_scores(dataset)
+    assert pssm.kmer_tables is not None
+
+    copied = pickle.loads(pickle.dumps(pssm))
+    assert copied.kmer_tables is None
+    assert np.array_equal(copied.scan_batch_window_scores(dataset), scores)
+    assert copied.kmer_tables is not None
+
@@ -0,0 +1,113 @@
+"""Tests the evolution of the organisms
+A seeded run must write the same output whether the fitness is evaluated in
+the main process, on a pool of threads or on a pool of processes
+"""
+
+import os
+import random
+import re
+import pytest
+import search_organisms
+from objects.placement_cache import PLACEMENT_CACHE
+from objects.score_cache import SCORE_CACHE
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+EXECUTORS = ["serial", "thread", "process"]
+# Small run, so every executor is tested in a few seconds
+RUN_CONFIG = {
+    "POPULATION_LENGTH": 10,
+    "MIN_ITERATIONS": 4,
+    "MAX_SEQUENCES_TO_FIT_POS": 20,
+    "MAX_SEQUENCES_TO_FIT_NEG": 20,
+    "PERIODIC_EXPORT": 100,
+    "EXECUTOR_WORKERS": 2,
+}
+SEED = 3
+# Times and cache counters change from run to run
+UNSTABLE_LINE_PREFIXES = ("Score cache", "Placement cache")
+TIME_PATTERN = r"Time: \S+( Clone time: \S+)?"
+
+
+def reset_caches() -> None:
+    """Disables and empties the caches enabled by the runs
+    """
+    for cache in [SCORE_CACHE, PLACEMENT_CACHE]:
+        cache.set_max_bytes(0)
+        cache.clear()
+        cache.reset_stats()
+
+
+def get_run_output(executor: str, result_dir: str) -> str:
+    """Runs the search with an executor and reads its output file
+
+    Args:
+        executor: "serial", "thread" or "process"
+        result_dir: directory where the results directory of the run is made
+
+    Returns:
+        content of the output file, without times and cache counters
+    """
+    main_config = dict(
+        RUN_CONFIG, EXECUTOR=executor, RESULT_BASE_PATH_DIR=result_dir
+    )
+    search_organisms.set_up({"main": main_config}, "_" + executor)
+    random.seed(SEED)
+    search_organisms.main()
+
+    with open(
+            search_organisms.RESULT_BASE_PATH_DIR
+            + search_organisms.OUTPUT_FILENAME
+    ) as output_file:
+        lines = [
+            re.sub(TIME_PATTERN, "", line)
+            for line in output_file
+            if not line.startswith(UNSTABLE_LINE_PREFIXES)
+        ]
+    return "".join(lines)
+
+
+def test_executors_write_identical_outputs(tmp_path, monkeypatch):
+    """Serial, thread and process executors evolve the same organisms
+    """
+    # Configuration and datasets are read relative to the sources
+    monkeypatch.chdir(SRC_DIR)
+    try:
+        outputs = [
+            get_run_output(executor, str(tmp_path) + "/")
+            for executor in EXECUTORS
+        ]
+    finally:
+        reset_caches()
+
+    assert outputs[0]
+    for output in outputs[1:]:
+        assert output == outputs[0]
+
+
+def test_steady_state_needs_two_organisms(tmp_path, monkeypatch):
+    """Steady state runs need a pair of organisms to cross. Progress is
+    reported on every evaluation, also before any organism is the best
+    """
+    monkeypatch.chdir(SRC_DIR)
+    main_config = dict(
+        RUN_CONFIG,
+        EVOLUTION_MODE="steady_state",
+        RESULT_BASE_PATH_DIR=str(tmp_path) + "/",
+    )
+    with pytest.raises(ValueError):
+        search_organisms.set_up(
+            {"main": dict(main_config, POPULATION_LENGTH=1)}
+        )
+
+    try:
+        search_organisms.set_up(
+            {
+                "main": dict(
+                    main_config, POPULATION_LENGTH=2, REPORT_INTERVAL=1
+                )
+            }
+        )
+        random.seed(SEED)
+        search_organisms.main()
+    finally:
+        reset_caches()